@@ -0,0 +1,78 @@
+# Deterministic search benchmark: a fixed set of positions, each searched to a fixed depth with fresh tables,
+# no random tie-breaks and no tablebases, so the node counts only change when the search itself does.
+# A speed-only change should keep the signature and raise the nps; a search change shows up in the signature.
+# Run from the Joueur.py directory:  python -m games.chess.Game3_bench [depth]   (or "bench" in Game3_uci)
+import argparse
+import sys
+import time
+import zlib
+
+from games.chess.Game3_chess_tools import BoardState, SearchContext, move_to_uci
+from games.chess.Game3_tablebases import loaded_tables
+from games.chess.Game3_time_manager import SearchLimits
+
+BENCH_DEPTH = 5
+BENCH_TT_SIZE_MB = 16
+
+# Don't change these without noting it: every recorded signature depends on them
+BENCH_POSITIONS = [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+    "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+    "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+    "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4",
+    "r2q1rk1/pp2bppp/2n1pn2/3p4/3P4/2NBPN2/PP3PPP/R2Q1RK1 w - - 0 10",
+    "rnbqkb1r/1p2pppp/p2p1n2/8/3NP3/2N5/PPP2PPP/R1BQKB1R w KQkq - 0 6",
+    "2rr3k/pp3pp1/1nnqbN1p/3pN3/2pP4/2P3Q1/PPB4P/R4RK1 w - - 0 1",
+    "8/8/4k3/3p4/3P1K2/8/5P2/8 w - - 0 1",
+    "6k1/5ppp/8/8/8/8/5PPP/3R2K1 b - - 0 1",
+]
+
+
+def bench_position(fen: str, depth: int):
+    # Returns (best move, nodes, seconds) for one position
+    state = BoardState.from_fen(fen)
+    context = SearchContext(BENCH_TT_SIZE_MB)
+    context.random_ties = False
+    start = time.perf_counter()
+    move = state.get_best_move(context, SearchLimits(context, depth=depth))
+    return move, context.nodes, time.perf_counter() - start
+
+
+def run_bench(depth: int = BENCH_DEPTH, output=print):
+    # Search every bench position, returning (total nodes, signature, seconds). The signature is a CRC of
+    # every position's node count and best move, so a change that happens to keep the total still shows.
+    # Tablebases already loaded (UCI process) are set aside so they can't change the counts.
+    total_nodes = 0
+    total_time = 0.0
+    signature = 0
+    tables = dict(loaded_tables)
+    loaded_tables.clear()
+    try:
+        for number, fen in enumerate(BENCH_POSITIONS, 1):
+            move, nodes, seconds = bench_position(fen, depth)
+            total_nodes += nodes
+            total_time += seconds
+            uci = move_to_uci(move) if move is not None else "0000"
+            signature = zlib.crc32(f"{nodes} {uci}\n".encode(), signature)
+            output(f"position {number:>2}/{len(BENCH_POSITIONS)}: {uci:<6} {nodes:>9,} nodes {seconds:6.2f}s")
+    finally:
+        loaded_tables.update(tables)
+    output(f"depth {depth}, {total_nodes:,} nodes in {total_time:.2f}s, "
+           f"{total_nodes / total_time if total_time > 0 else 0:,.0f} nps")
+    output(f"signature {total_nodes}-{signature:08x}")
+    return total_nodes, signature, total_time
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Fixed-depth search benchmark with a node-count signature")
+    parser.add_argument("depth", nargs="?", type=int, default=BENCH_DEPTH, help="search depth")
+    args = parser.parse_args(argv)
+    run_bench(args.depth)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
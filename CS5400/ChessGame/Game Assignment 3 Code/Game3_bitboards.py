@@ -0,0 +1,158 @@
+# Precomputed bitboard tables for the chess engine.
+# Squares use the same indexing as BoardState.board: 0 = a8, 7 = h8, 56 = a1, 63 = h1,
+# so bit i of every bitboard refers to board[i] (row = i // 8, col = i % 8).
+
+FULL_BOARD = (1 << 64) - 1
+
+# Files and ranks
+FILE_A = sum(1 << (row * 8) for row in range(8))
+FILE_H = FILE_A << 7
+NOT_FILE_A = FULL_BOARD ^ FILE_A
+NOT_FILE_H = FULL_BOARD ^ FILE_H
+
+RANK_8 = 0xFF  # row 0 (white promotion rank)
+RANK_6 = 0xFF << 16  # row 2 (black pawns land here after a single push)
+RANK_3 = 0xFF << 40  # row 5 (white pawns land here after a single push)
+RANK_1 = 0xFF << 56  # row 7 (black promotion rank)
+PROMOTION_RANKS = RANK_8 | RANK_1
+
+KNIGHT_DIRECTIONS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+KING_DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1), (-1, 0), (1, 0), (0, -1), (0, 1)]
+BISHOP_DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+
+def _on_board(row: int, col: int) -> bool:
+    return 0 <= row < 8 and 0 <= col < 8
+
+
+def _step_attacks(directions) -> list:
+    # One step in each direction from every square
+    table = []
+    for square in range(64):
+        row, col = divmod(square, 8)
+        attacks = 0
+        for dr, dc in directions:
+            if _on_board(row + dr, col + dc):
+                attacks |= 1 << ((row + dr) * 8 + col + dc)
+        table.append(attacks)
+    return table
+
+
+def _ray_attacks(square: int, directions, occupied: int) -> int:
+    # Slide in each direction until the edge or the first blocker (blocker included)
+    row, col = divmod(square, 8)
+    attacks = 0
+    for dr, dc in directions:
+        r, c = row + dr, col + dc
+        while _on_board(r, c):
+            bit = 1 << (r * 8 + c)
+            attacks |= bit
+            if occupied & bit:
+                break
+            r, c = r + dr, c + dc
+    return attacks
+
+
+def _relevant_mask(square: int, directions) -> int:
+    # Squares whose occupancy can change the attack set (the last square of each ray never can)
+    row, col = divmod(square, 8)
+    mask = 0
+    for dr, dc in directions:
+        r, c = row + dr, col + dc
+        while _on_board(r + dr, c + dc):
+            mask |= 1 << (r * 8 + c)
+            r, c = r + dr, c + dc
+    return mask
+
+
+def _subsets(mask: int):
+    # Every subset of the mask (Carry-Rippler enumeration)
+    subset = 0
+    while True:
+        yield subset
+        subset = (subset - mask) & mask
+        if subset == 0:
+            break
+
+
+def _slider_tables(directions):
+    # For each square: the relevant occupancy mask, and a table from masked occupancy to attacks
+    masks = []
+    tables = []
+    for square in range(64):
+        mask = _relevant_mask(square, directions)
+        masks.append(mask)
+        tables.append({occupied: _ray_attacks(square, directions, occupied) for occupied in _subsets(mask)})
+    return masks, tables
+
+
+def _line_tables():
+    # BETWEEN[a][b]: squares strictly between a and b, LINE[a][b]: the whole line through both
+    # (both are 0 when the squares don't share a rank, file or diagonal)
+    between = [[0] * 64 for _ in range(64)]
+    line = [[0] * 64 for _ in range(64)]
+    for square in range(64):
+        row, col = divmod(square, 8)
+        for dr, dc in KING_DIRECTIONS:
+            full_line = (1 << square) | _ray_attacks(square, [(dr, dc), (-dr, -dc)], 0)
+            path = 0
+            r, c = row + dr, col + dc
+            while _on_board(r, c):
+                target = r * 8 + c
+                between[square][target] = path
+                line[square][target] = full_line
+                path |= 1 << target
+                r, c = r + dr, c + dc
+    return between, line
+
+
+def _rook_tables():
+    # Rook attacks split into independent rank and file lines, so the full table is built by
+    # combining the two (much cheaper than sliding for every one of the 4096 corner occupancies)
+    rank_masks, rank_tables = _slider_tables([(0, -1), (0, 1)])
+    file_masks, file_tables = _slider_tables([(-1, 0), (1, 0)])
+    masks = []
+    tables = []
+    for square in range(64):
+        masks.append(rank_masks[square] | file_masks[square])
+        table = {}
+        for rank_occupied, rank_attacks in rank_tables[square].items():
+            for file_occupied, file_attacks in file_tables[square].items():
+                table[rank_occupied | file_occupied] = rank_attacks | file_attacks
+        tables.append(table)
+    return masks, tables
+
+
+KNIGHT_ATTACKS = _step_attacks(KNIGHT_DIRECTIONS)
+KING_ATTACKS = _step_attacks(KING_DIRECTIONS)
+# Squares attacked by a pawn standing on a square, indexed [is_white][square]
+PAWN_ATTACKS = (_step_attacks([(1, -1), (1, 1)]), _step_attacks([(-1, -1), (-1, 1)]))
+
+ROOK_MASKS, ROOK_TABLES = _rook_tables()
+BISHOP_MASKS, BISHOP_TABLES = _slider_tables(BISHOP_DIRECTIONS)
+
+BETWEEN, LINE = _line_tables()
+
+
+# ========== ATTACK LOOKUPS ==========
+
+def rook_attacks(square: int, occupied: int) -> int:
+    return ROOK_TABLES[square][occupied & ROOK_MASKS[square]]
+
+
+def bishop_attacks(square: int, occupied: int) -> int:
+    return BISHOP_TABLES[square][occupied & BISHOP_MASKS[square]]
+
+
+def queen_attacks(square: int, occupied: int) -> int:
+    return rook_attacks(square, occupied) | bishop_attacks(square, occupied)
+
+
+# ========== BIT HELPERS ==========
+
+def iter_squares(bitboard: int):
+    while bitboard:
+        low = bitboard & -bitboard
+        yield low.bit_length() - 1
+        bitboard ^= low
+
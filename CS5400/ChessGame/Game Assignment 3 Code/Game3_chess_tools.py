@@ -6,43 +6,142 @@
 #######################################
 import math
 import random
-
+import time
+
+from games.chess.Game3_bitboards import (
+    BETWEEN, BISHOP_MASKS, BISHOP_TABLES, FULL_BOARD, KING_ATTACKS, KNIGHT_ATTACKS, LINE, NOT_FILE_A, NOT_FILE_H,
+    PAWN_ATTACKS, PROMOTION_RANKS, RANK_3, RANK_6, ROOK_MASKS, ROOK_TABLES
+)
+from games.chess.Game3_search_stats import SearchStats
+from games.chess.Game3_tablebases import TABLEBASE_MAX_PIECES, loaded_tables, probe_tablebase
+from games.chess.Game3_time_manager import TimeManager
+from games.chess.Game3_transposition import (
+    BOUND_EXACT, BOUND_LOWER, BOUND_UPPER, FLIPPED_BOUNDS, ZOBRIST_BLACK_TO_MOVE, ZOBRIST_CASTLING, ZOBRIST_EN_PASSANT,
+    ZOBRIST_PIECES, TranspositionTable, compute_hash
+)
 from games.chess.game import Game
 
-# Move directions for each "normal" piece
-MOVING_RULES = {
-    "r": ([(-1, 0), (1, 0), (0, -1), (0, 1)], True),
-    "n": ([(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)], False),
-    "b": ([(-1, -1), (-1, 1), (1, -1), (1, 1)], True),
-    "q": ([(-1, -1), (-1, 1), (1, -1), (1, 1), (-1, 0), (1, 0), (0, -1), (0, 1)], True),
-    "k": ([(-1, -1), (-1, 1), (1, -1), (1, 1), (-1, 0), (1, 0), (0, -1), (0, 1)], False)
-}
-
 PIECE_VALUES = {
     "p": 1, "n": 3, "b": 3, "r": 5, "q": 9, "k": 0
 }
 
+PIECE_CHARS = "PNBRQKpnbrqk"
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# Move generation modes: everything, captures and queen promotions (quiescence and the first
+# search stage), or everything else (the last search stage)
+GEN_ALL = 0
+GEN_CAPTURES = 1
+GEN_QUIETS = 2
+PROMOTION_CHOICES = {GEN_ALL: "qrbn", GEN_CAPTURES: "q", GEN_QUIETS: "rbn"}
+
+# Checkmate scores are MATE_SCORE minus the distance (in plies) from the root
+MATE_SCORE = 100_000
+MATE_THRESHOLD = MATE_SCORE - 1000
+
+# Evaluation terms (in centipawns, so the running totals stay exact integers)
+CENTER_SQUARES = [27, 35, 36, 28]  # (d4, d5, e4, e5)
+CENTER_BONUS = 30
+DEVELOPMENT_BONUS = 20
+TEMPO_BONUS = 5
+
+
+def _balance_table(piece: str) -> list:
+    # Material plus center control for a piece on each square, signed from white's point of view
+    sign = 1 if piece.isupper() else -1
+    value = PIECE_VALUES[piece.lower()] * 100
+    return [sign * (value + (CENTER_BONUS if square in CENTER_SQUARES else 0)) for square in range(64)]
+
+
+def _development_table(piece: str) -> list:
+    # Reward knights and bishops for leaving the back two ranks
+    if piece.lower() not in "nb":
+        return [0] * 64
+    if piece.isupper():
+        return [DEVELOPMENT_BONUS if square // 8 <= 5 else 0 for square in range(64)]
+    return [DEVELOPMENT_BONUS if square // 8 >= 2 else 0 for square in range(64)]
+
+
+BALANCE_SCORES = {piece: _balance_table(piece) for piece in PIECE_CHARS}
+DEVELOPMENT_SCORES = {piece: _development_table(piece) for piece in PIECE_CHARS}
+
+# Moves are 16-bit integers: start square (bits 0-5), end square (bits 6-11) and promotion code (bits 12-14).
+# The low 12 bits alone also index the history table.
+MOVE_SQUARES_MASK = 4095
+PROMOTION_SHIFT = 12
+PROMOTION_CODES = {None: 0, "n": 1, "b": 2, "r": 3, "q": 4}
+PROMOTION_PIECES = [None, "n", "b", "r", "q"]
+# Promoted piece by [mover is white][promotion code]
+PROMOTED_PIECES = ([None, "n", "b", "r", "q"], [None, "N", "B", "R", "Q"])
+QUEEN_PROMOTION = PROMOTION_CODES["q"] << PROMOTION_SHIFT
+# Promotion bits to generate for each generation mode
+PROMOTION_FLAGS = {mode: tuple(PROMOTION_CODES[piece] << PROMOTION_SHIFT for piece in pieces)
+                   for mode, pieces in PROMOTION_CHOICES.items()}
+
+# Square names and the UCI text of every start/end pair, so converting moves to text is a lookup
+SQUARE_NAMES = [chr(ord('a') + index % 8) + str(8 - index // 8) for index in range(64)]
+SQUARE_INDICES = {name: index for index, name in enumerate(SQUARE_NAMES)}
+UCI_SQUARE_PAIRS = [SQUARE_NAMES[squares & 63] + SQUARE_NAMES[squares >> 6] for squares in range(4096)]
+
+# Castling rook moves, keyed by the king's destination square
+CASTLING_ROOK_MOVES = {62: (63, 61), 58: (56, 59), 6: (7, 5), 2: (0, 3)}
+
+# Castling rights are stored as a bitmask
+CASTLE_WHITE_KINGSIDE = 1
+CASTLE_WHITE_QUEENSIDE = 2
+CASTLE_BLACK_KINGSIDE = 4
+CASTLE_BLACK_QUEENSIDE = 8
+CASTLING_FEN_RIGHTS = {"K": CASTLE_WHITE_KINGSIDE, "Q": CASTLE_WHITE_QUEENSIDE,
+                       "k": CASTLE_BLACK_KINGSIDE, "q": CASTLE_BLACK_QUEENSIDE}
+
+# Castling rights kept when a piece leaves or lands on each square (king and rook home squares)
+CASTLING_SQUARE_MASKS = [15] * 64
+CASTLING_SQUARE_MASKS[60] = 15 ^ (CASTLE_WHITE_KINGSIDE | CASTLE_WHITE_QUEENSIDE)
+CASTLING_SQUARE_MASKS[63] = 15 ^ CASTLE_WHITE_KINGSIDE
+CASTLING_SQUARE_MASKS[56] = 15 ^ CASTLE_WHITE_QUEENSIDE
+CASTLING_SQUARE_MASKS[4] = 15 ^ (CASTLE_BLACK_KINGSIDE | CASTLE_BLACK_QUEENSIDE)
+CASTLING_SQUARE_MASKS[7] = 15 ^ CASTLE_BLACK_KINGSIDE
+CASTLING_SQUARE_MASKS[0] = 15 ^ CASTLE_BLACK_QUEENSIDE
+
 
 class BoardState:
-    def __init__(self, game: Game):
-        # Get the starting FEN
-        self.fen = game.fen
+    def __init__(self, game: Game | None = None, fen: str | None = None):
+        # Get the starting FEN (from the live game, or given directly)
+        self.fen = game.fen if game is not None else fen
 
         # Storage variables for all the FEN stuff
         self.board = [None] * 64
         self.white_to_move = None
-        self.castling_rights = {'K': False, 'Q': False, 'k': False, 'q': False}
-        self.en_passant_target = None
+        self.castling_rights = 0
         self.en_passant_index = None
         self.halfmove_clock = 0
         self.fullmove_number = 1
 
+        # One bitboard per piece character, plus occupancy masks indexed by color (True = white)
+        self.bitboards = dict.fromkeys(PIECE_CHARS, 0)
+        self.occupancy = [0, 0]
+        self.occupied = 0
+
+        # Zobrist hash of the position (kept up to date by make_move)
+        self.hash = 0
+
+        # Running evaluation totals (kept up to date by make_move):
+        # material and center control from white's point of view, and development per color
+        self.eval_balance = 0
+        self.white_development = 0
+        self.black_development = 0
+
         # Update values from FEN
         self.parse_fen(self.fen)
 
         # Tracking for heuristic checks
         self.is_white_player = self.white_to_move
 
+    @classmethod
+    def from_fen(cls, fen: str) -> 'BoardState':
+        # Build a board without a live Game (perft, benchmarks, offline tools)
+        return cls(fen=fen)
+
     def parse_fen(self, fen: str):
         # Split the FEN into sections
         sections = fen.split(" ")
@@ -56,24 +155,27 @@ class BoardState:
                 else:
                     self.board.append(char)
 
+        # Build the bitboards from the parsed board
+        self.bitboards = dict.fromkeys(PIECE_CHARS, 0)
+        self.occupancy = [0, 0]
+        for i, piece in enumerate(self.board):
+            if piece is not None:
+                self.bitboards[piece] |= 1 << i
+                self.occupancy[piece.isupper()] |= 1 << i
+        self.occupied = self.occupancy[0] | self.occupancy[1]
+
         # Get the turn value
         self.white_to_move = sections[1] == "w"
 
         # Get the castling rights
+        self.castling_rights = 0
         for char in sections[2]:
-            if char == "K":
-                self.castling_rights["K"] = True
-            elif char == "Q":
-                self.castling_rights["Q"] = True
-            elif char == "k":
-                self.castling_rights["k"] = True
-            elif char == "q":
-                self.castling_rights["q"] = True
+            self.castling_rights |= CASTLING_FEN_RIGHTS.get(char, 0)
 
         # Get the en passant target
+        self.en_passant_index = None
         if sections[3] != "-":
-            self.en_passant_target = sections[3]
-            self.en_passant_index = square_to_index(self.en_passant_target)
+            self.en_passant_index = square_to_index(sections[3])
 
         # Get the halfmove clock
         self.halfmove_clock = int(sections[4])
@@ -81,46 +183,229 @@ class BoardState:
         # Get the fullmove number
         self.fullmove_number = int(sections[5])
 
+        self.hash = compute_hash(self.board, self.white_to_move, self.castling_rights, self.en_passant_index)
+
+        # Evaluation totals from scratch
+        self.eval_balance = 0
+        self.white_development = 0
+        self.black_development = 0
+        for i, piece in enumerate(self.board):
+            if piece is not None:
+                self.eval_balance += BALANCE_SCORES[piece][i]
+                if piece.isupper():
+                    self.white_development += DEVELOPMENT_SCORES[piece][i]
+                else:
+                    self.black_development += DEVELOPMENT_SCORES[piece][i]
+
+    @property
+    def en_passant_target(self):
+        # En passant target square name (e.g. "e3"), or None
+        if self.en_passant_index is None:
+            return None
+        return index_to_square(self.en_passant_index)
+
     def get_piece_valid_moves(self, position: int):
         # Get all the valid moves for a piece
         piece = self.board[position]
-        moves = []
-        if piece is None:
+        if piece is None or piece.isupper() != self.white_to_move:
             return []
-        lower = piece.lower()
-        if lower in MOVING_RULES:
-            # Normal moving pieces
-            moves = get_simple_piece_moves(self, position)
-            # Kings can also castle
-            if lower == "k":
-                moves += get_castling_moves(self, piece.isupper())
-        elif lower == "p":
-            # Pawns
-            moves = get_pawn_valid_moves(self, position)
-
-        # Return move data
-        return [(position, move[0], move[1]) for move in moves]
+        return generate_moves(self, get_move_restrictions(self), GEN_ALL, 1 << position)
 
     def get_all_valid_moves(self):
-        # Get all valid moves for the current player
-        moves = []
-        for i in range(64):
-            # Only get moves for the current player
-            if self.board[i] is not None and self.board[i].isupper() == self.white_to_move:
-                moves.extend(self.get_piece_valid_moves(i))
-        return moves
-
-    def get_best_move(self):
-        # Get the best move using minimax
-        return depth_limited_alpha_beta_id_minimax(self)
+        # Get all legal moves for the current player
+        return generate_moves(self, get_move_restrictions(self), GEN_ALL)
+
+    def is_in_check(self) -> bool:
+        king = self.bitboards["K" if self.white_to_move else "k"].bit_length() - 1
+        return is_square_attacked(self, king, not self.white_to_move, self.occupied)
+
+    def make_move(self, move):
+        # Apply a move in place and return the record needed to undo it: (captured piece, previous castling rights,
+        # en passant index, halfmove clock, hash, and evaluation totals)
+        start_idx = move & 63
+        end_idx = (move >> 6) & 63
+        board = self.board
+        bitboards = self.bitboards
+        occupancy = self.occupancy
+        moving_piece = board[start_idx]
+        captured_piece = board[end_idx]
+        is_white = self.white_to_move
+        start_bit = 1 << start_idx
+        end_bit = 1 << end_idx
+        undo = (captured_piece, self.castling_rights, self.en_passant_index, self.halfmove_clock, self.hash,
+                self.eval_balance, self.white_development, self.black_development)
+        key = self.hash ^ ZOBRIST_BLACK_TO_MOVE
+
+        # Remove a captured piece
+        if captured_piece is not None:
+            bitboards[captured_piece] ^= end_bit
+            occupancy[not is_white] ^= end_bit
+            key ^= ZOBRIST_PIECES[captured_piece][end_idx]
+            self.eval_balance -= BALANCE_SCORES[captured_piece][end_idx]
+            if is_white:
+                self.black_development -= DEVELOPMENT_SCORES[captured_piece][end_idx]
+            else:
+                self.white_development -= DEVELOPMENT_SCORES[captured_piece][end_idx]
+
+        # Move the piece (handling promotion)
+        placed_piece = moving_piece
+        if move >> PROMOTION_SHIFT:
+            placed_piece = PROMOTED_PIECES[is_white][move >> PROMOTION_SHIFT]
+        bitboards[moving_piece] ^= start_bit
+        bitboards[placed_piece] |= end_bit
+        occupancy[is_white] ^= start_bit | end_bit
+        board[end_idx] = placed_piece
+        board[start_idx] = None
+        key ^= ZOBRIST_PIECES[moving_piece][start_idx] ^ ZOBRIST_PIECES[placed_piece][end_idx]
+        self.eval_balance += BALANCE_SCORES[placed_piece][end_idx] - BALANCE_SCORES[moving_piece][start_idx]
+        if is_white:
+            self.white_development += DEVELOPMENT_SCORES[placed_piece][end_idx] - DEVELOPMENT_SCORES[moving_piece][start_idx]
+        else:
+            self.black_development += DEVELOPMENT_SCORES[placed_piece][end_idx] - DEVELOPMENT_SCORES[moving_piece][start_idx]
+
+        previous_ep_index = self.en_passant_index
+        self.en_passant_index = None
+        if previous_ep_index is not None:
+            key ^= ZOBRIST_EN_PASSANT[previous_ep_index & 7]
+        if moving_piece == "P" or moving_piece == "p":
+            # Handle en passant
+            if end_idx == previous_ep_index:
+                # Clear the pawn that was captured
+                capture_idx = end_idx + (8 if is_white else -8)
+                captured_piece = board[capture_idx]
+                board[capture_idx] = None
+                bitboards[captured_piece] ^= 1 << capture_idx
+                occupancy[not is_white] ^= 1 << capture_idx
+                key ^= ZOBRIST_PIECES[captured_piece][capture_idx]
+                self.eval_balance -= BALANCE_SCORES[captured_piece][capture_idx]
+
+            # Check for double pawn move
+            elif end_idx - start_idx == 16 or start_idx - end_idx == 16:
+                self.en_passant_index = (start_idx + end_idx) // 2
+                key ^= ZOBRIST_EN_PASSANT[start_idx & 7]
+
+            self.halfmove_clock = 0
+        else:
+            # Handle castling (the king moves two squares, so move the rook too)
+            if (moving_piece == "K" or moving_piece == "k") and (end_idx - start_idx == 2 or start_idx - end_idx == 2):
+                rook_from, rook_to = CASTLING_ROOK_MOVES[end_idx]
+                rook_bits = (1 << rook_from) | (1 << rook_to)
+                rook = board[rook_from]
+                board[rook_to] = rook
+                board[rook_from] = None
+                bitboards[rook] ^= rook_bits
+                occupancy[is_white] ^= rook_bits
+                key ^= ZOBRIST_PIECES[rook][rook_from] ^ ZOBRIST_PIECES[rook][rook_to]
+                self.eval_balance += BALANCE_SCORES[rook][rook_to] - BALANCE_SCORES[rook][rook_from]
+
+            # Update halfmoves
+            self.halfmove_clock = 0 if captured_piece is not None else self.halfmove_clock + 1
+
+        self.occupied = occupancy[0] | occupancy[1]
+
+        # Update castling rights (a king or rook leaving home, or a rook being captured at home)
+        rights = self.castling_rights & CASTLING_SQUARE_MASKS[start_idx] & CASTLING_SQUARE_MASKS[end_idx]
+        if rights != self.castling_rights:
+            key ^= ZOBRIST_CASTLING[self.castling_rights] ^ ZOBRIST_CASTLING[rights]
+            self.castling_rights = rights
+        self.hash = key
+
+        # Update turn (fullmoves increment after black moves)
+        self.white_to_move = not is_white
+        if not is_white:
+            self.fullmove_number += 1
+
+        return undo
+
+    def unmake_move(self, move, undo):
+        # Restore the state from before make_move(move) using its undo record
+        start_idx = move & 63
+        end_idx = (move >> 6) & 63
+        (captured_piece, self.castling_rights, self.en_passant_index, self.halfmove_clock, self.hash,
+         self.eval_balance, self.white_development, self.black_development) = undo
+        board = self.board
+        bitboards = self.bitboards
+        occupancy = self.occupancy
+        is_white = not self.white_to_move
+        self.white_to_move = is_white
+        if not is_white:
+            self.fullmove_number -= 1
+
+        start_bit = 1 << start_idx
+        end_bit = 1 << end_idx
+        placed_piece = board[end_idx]
+        moving_piece = ("P" if is_white else "p") if move >> PROMOTION_SHIFT else placed_piece
+
+        # Move the piece back
+        bitboards[placed_piece] ^= end_bit
+        bitboards[moving_piece] |= start_bit
+        occupancy[is_white] ^= start_bit | end_bit
+        board[start_idx] = moving_piece
+        board[end_idx] = captured_piece
+
+        # Put back a captured piece
+        if captured_piece is not None:
+            bitboards[captured_piece] |= end_bit
+            occupancy[not is_white] |= end_bit
+        elif moving_piece == "P" or moving_piece == "p":
+            # En passant (the captured pawn sits behind the target square)
+            if end_idx == self.en_passant_index:
+                capture_idx = end_idx + (8 if is_white else -8)
+                pawn = "p" if is_white else "P"
+                board[capture_idx] = pawn
+                bitboards[pawn] |= 1 << capture_idx
+                occupancy[not is_white] |= 1 << capture_idx
+        elif (moving_piece == "K" or moving_piece == "k") and (end_idx - start_idx == 2 or start_idx - end_idx == 2):
+            # Castling (move the rook back)
+            rook_from, rook_to = CASTLING_ROOK_MOVES[end_idx]
+            rook_bits = (1 << rook_from) | (1 << rook_to)
+            board[rook_from] = board[rook_to]
+            board[rook_to] = None
+            bitboards[board[rook_from]] ^= rook_bits
+            occupancy[is_white] ^= rook_bits
+
+        self.occupied = occupancy[0] | occupancy[1]
+
+    def make_null_move(self):
+        # Pass the turn (for null-move pruning): only the side to move and the en passant square change
+        undo = (self.en_passant_index, self.hash)
+        key = self.hash ^ ZOBRIST_BLACK_TO_MOVE
+        if self.en_passant_index is not None:
+            key ^= ZOBRIST_EN_PASSANT[self.en_passant_index & 7]
+            self.en_passant_index = None
+        self.hash = key
+        self.white_to_move = not self.white_to_move
+        return undo
+
+    def unmake_null_move(self, undo):
+        self.en_passant_index, self.hash = undo
+        self.white_to_move = not self.white_to_move
+
+    def get_all_captures(self):
+        # Legal captures (and queen promotions) only, without building the quiet moves
+        return generate_moves(self, get_move_restrictions(self), GEN_CAPTURES)
+
+    def has_legal_move(self) -> bool:
+        return has_legal_move(self)
+
+    def get_best_move(self, context=None, time_manager=None, parallel=None):
+        # Get the best move using minimax (to a fixed depth, or as deep as the time manager allows),
+        # optionally splitting the root moves across a Game3_parallel.ParallelSearch pool
+        return depth_limited_alpha_beta_id_minimax(self, context, time_manager, parallel)
 
     def copy(self):
         # Make a deep copy of the board
         new_board = BoardState.__new__(BoardState)
         new_board.board = self.board.copy()
+        new_board.bitboards = self.bitboards.copy()
+        new_board.occupancy = self.occupancy.copy()
+        new_board.occupied = self.occupied
+        new_board.hash = self.hash
+        new_board.eval_balance = self.eval_balance
+        new_board.white_development = self.white_development
+        new_board.black_development = self.black_development
         new_board.white_to_move = self.white_to_move
-        new_board.castling_rights = self.castling_rights.copy()
-        new_board.en_passant_target = self.en_passant_target
+        new_board.castling_rights = self.castling_rights
         new_board.en_passant_index = self.en_passant_index
         new_board.halfmove_clock = self.halfmove_clock
         new_board.fullmove_number = self.fullmove_number
@@ -132,381 +417,1190 @@ class BoardState:
         return evaluate_heuristic(self)
 
 
-# ========== PIECE MOVEMENT ==========
+# ========== ATTACKS ==========
+
+def attackers_to(board_state: BoardState, square: int, by_white: bool, occupied: int) -> int:
+    # Bitboard of the pieces of one color attacking a square (sliders see through nothing outside occupied)
+    bitboards = board_state.bitboards
+    pawn, knight, bishop, rook, queen, king = "PNBRQK" if by_white else "pnbrqk"
+    return ((PAWN_ATTACKS[not by_white][square] & bitboards[pawn])
+            | (KNIGHT_ATTACKS[square] & bitboards[knight])
+            | (KING_ATTACKS[square] & bitboards[king])
+            | (BISHOP_TABLES[square][occupied & BISHOP_MASKS[square]] & (bitboards[bishop] | bitboards[queen]))
+            | (ROOK_TABLES[square][occupied & ROOK_MASKS[square]] & (bitboards[rook] | bitboards[queen])))
+
+
+def is_square_attacked(board_state: BoardState, square: int, by_white: bool, occupied: int) -> bool:
+    # Same as attackers_to, but stops at the first attacker found
+    bitboards = board_state.bitboards
+    pawn, knight, bishop, rook, queen, king = "PNBRQK" if by_white else "pnbrqk"
+    return bool((KNIGHT_ATTACKS[square] & bitboards[knight])
+                or (PAWN_ATTACKS[not by_white][square] & bitboards[pawn])
+                or (BISHOP_TABLES[square][occupied & BISHOP_MASKS[square]] & (bitboards[bishop] | bitboards[queen]))
+                or (ROOK_TABLES[square][occupied & ROOK_MASKS[square]] & (bitboards[rook] | bitboards[queen]))
+                or (KING_ATTACKS[square] & bitboards[king]))
+
+
+def get_move_restrictions(board_state: BoardState):
+    # Everything legal move generation needs to know about the side to move's king:
+    # (king square, checking pieces, squares that resolve the check, pinned pieces)
+    white = board_state.white_to_move
+    bitboards = board_state.bitboards
+    occupied = board_state.occupied
+    own = board_state.occupancy[white]
+    enemy = board_state.occupancy[not white]
+    king = bitboards["K" if white else "k"].bit_length() - 1
+    checkers = attackers_to(board_state, king, not white, occupied)
+
+    # Moves have to capture the checker or block its line (nothing but the king can answer a double check)
+    if not checkers:
+        evasion_mask = FULL_BOARD
+    elif checkers & (checkers - 1):
+        evasion_mask = 0
+    else:
+        evasion_mask = checkers | BETWEEN[king][checkers.bit_length() - 1]
 
-def get_simple_piece_moves(board_state: BoardState, position: int):
-    board = board_state.board
-    piece = board[position]
-    moving_directions, can_slide = MOVING_RULES[piece.lower()]
-    valid_moves = []
+    # Enemy sliders lined up with the king with exactly one of our pieces in between pin that piece
+    _, _, bishop, rook, queen, _ = "pnbrqk" if white else "PNBRQK"
+    snipers = ((BISHOP_TABLES[king][enemy & BISHOP_MASKS[king]] & (bitboards[bishop] | bitboards[queen]))
+               | (ROOK_TABLES[king][enemy & ROOK_MASKS[king]] & (bitboards[rook] | bitboards[queen])))
+    pinned = 0
+    while snipers:
+        low = snipers & -snipers
+        blockers = BETWEEN[king][low.bit_length() - 1] & occupied
+        if blockers and not blockers & (blockers - 1) and blockers & own:
+            pinned |= blockers
+        snipers ^= low
 
-    # Get all the valid moves in each direction
-    for dx, dy in moving_directions:
-        cur_row, cur_col = position // 8, position % 8
-        step = 1
-        while True:
-            # Keep going in this direction until we have to stop
-            new_row, new_col = cur_row + step * dx, cur_col + step * dy
-            if not (0 <= new_row < 8 and 0 <= new_col < 8):
-                break  # off the board
-
-            new_position = new_row * 8 + new_col
-            target_piece = board[new_position]
-
-            if target_piece is None:
-                # Empty square, can keep going
-                valid_moves.append((new_position, None))
-            elif is_enemy(piece, target_piece):
-                # Can take enemy piece, but can't keep going after
-                valid_moves.append((new_position, None))
-                break
-            else:
-                # Can't take our own piece
-                break
+    return king, checkers, evasion_mask, pinned
+
+
+# ========== PIECE MOVEMENT ==========
 
-            if not can_slide:
-                break  # Can't slide, so just do one move
-            step += 1
-
-    return valid_moves
-
-
-def get_pawn_valid_moves(board_state: BoardState, position: int):
-    # Get the piece and its initial state
-    board = board_state.board
-    piece = board[position]
-    is_white = piece.isupper()
-    direction = -1 if is_white else 1
-    start_row = 6 if is_white else 1
-    curr_row, curr_col = position // 8, position % 8
-    valid_moves = []
-
-    # Forward moves
-    one_forward = position + direction * 8
-    new_row = one_forward // 8
-    if is_on_board(one_forward) and board[one_forward] is None:
-        # Clear square ahead
-        if new_row == 0 or new_row == 7:
+def add_target_moves(moves: list, start: int, targets: int):
+    # Add a move from start to every square in the targets bitboard
+    while targets:
+        low = targets & -targets
+        moves.append(start | (low.bit_length() - 1) << 6)
+        targets ^= low
+
+
+def add_pawn_target_moves(moves: list, targets: int, offset: int, promotions: tuple = PROMOTION_FLAGS[GEN_ALL]):
+    # Add pawn moves landing on every square in targets, each coming from (target - offset)
+    while targets:
+        low = targets & -targets
+        end = low.bit_length() - 1
+        move = (end - offset) | end << 6
+        if low & PROMOTION_RANKS:
             # The pawn is moving to a back rank (promotion)
-            for promotion in "qrbn":
-                # Add all possible promotions
-                valid_moves.append((one_forward, promotion))
+            for promotion in promotions:
+                moves.append(move | promotion)
         else:
-            # Not a back rank (normal step forward)
-            valid_moves.append((one_forward, None))
-
-        # Double forward move (start row only)
-        two_forward = one_forward + direction * 8
-        if curr_row == start_row and board[two_forward] is None:
-            # Clear square two ahead
-            valid_moves.append((two_forward, None))
-
-    # Diagonal moves (captures)
-    for dx in [-1, 1]:
-        # Try left and right
-        new_col = curr_col + dx
-        if 0 <= new_col < 8:
-            diagonal = one_forward + dx
-            new_row = diagonal // 8
-            if is_on_board(diagonal):
-                # Check for a target piece
-                target_piece = board[diagonal]
-                # Can only take enemies
-                if target_piece and is_enemy(piece, target_piece):
-                    # Check for promotions
-                    if new_row == 0 or new_row == 7:
-                        # The pawn is moving to a back rank (promotion)
-                        for promotion in "qrbn":
-                            # Add all possible promotions
-                            valid_moves.append((diagonal, promotion))
-                    else:
-                        # Not a back rank (normal step forward)
-                        valid_moves.append((diagonal, None))
-
-    # En passant
+            moves.append(move)
+        targets ^= low
+
+
+def add_pawn_set_moves(board_state: BoardState, moves: list, pawns: int, mask: int, mode: int):
+    # Generate moves for a set of pawns at once by shifting the bitboard, keeping only targets inside mask
+    white = board_state.white_to_move
+    empty = ~board_state.occupied & FULL_BOARD
+    enemy = board_state.occupancy[not white] & mask
+    promotions = PROMOTION_FLAGS[mode]
+    if mode == GEN_QUIETS:
+        enemy &= PROMOTION_RANKS  # Only the underpromotions of capturing promotions count as quiet
+
+    if white:
+        single = (pawns >> 8) & empty
+        if mode == GEN_CAPTURES:
+            add_pawn_target_moves(moves, single & PROMOTION_RANKS & mask, -8, promotions)
+        else:
+            double = ((single & RANK_3) >> 8) & empty
+            add_pawn_target_moves(moves, single & mask, -8, promotions)
+            add_pawn_target_moves(moves, double & mask, -16)
+        add_pawn_target_moves(moves, ((pawns & NOT_FILE_A) >> 9) & enemy, -9, promotions)
+        add_pawn_target_moves(moves, ((pawns & NOT_FILE_H) >> 7) & enemy, -7, promotions)
+    else:
+        single = (pawns << 8) & empty
+        if mode == GEN_CAPTURES:
+            add_pawn_target_moves(moves, single & PROMOTION_RANKS & mask, 8, promotions)
+        else:
+            double = ((single & RANK_6) << 8) & empty
+            add_pawn_target_moves(moves, single & mask, 8, promotions)
+            add_pawn_target_moves(moves, double & mask, 16)
+        add_pawn_target_moves(moves, ((pawns & NOT_FILE_A) << 7) & enemy, 7, promotions)
+        add_pawn_target_moves(moves, ((pawns & NOT_FILE_H) << 9) & enemy, 9, promotions)
+
+
+def generate_moves(board_state: BoardState, restrictions, mode: int = GEN_ALL, from_mask: int = FULL_BOARD) -> list:
+    # Legal moves of one kind (GEN_ALL/GEN_CAPTURES/GEN_QUIETS) for the pieces in from_mask
+    moves = []
+    get_pawn_moves(board_state, moves, restrictions, mode, from_mask)
+    get_piece_moves(board_state, moves, restrictions, mode, from_mask)
+    if mode != GEN_CAPTURES and not restrictions[1] and from_mask & (1 << restrictions[0]):
+        get_castling_moves(board_state, moves)
+    return moves
+
+
+def get_pawn_moves(board_state: BoardState, moves: list, restrictions, mode: int = GEN_ALL,
+                   from_mask: int = FULL_BOARD):
+    king, _, evasion_mask, pinned = restrictions
+    pawns = board_state.bitboards["P" if board_state.white_to_move else "p"] & from_mask
+
+    # Unpinned pawns all at once, pinned pawns one at a time along their pin line
+    add_pawn_set_moves(board_state, moves, pawns & ~pinned, evasion_mask, mode)
+    pinned_pawns = pawns & pinned
+    while pinned_pawns:
+        low = pinned_pawns & -pinned_pawns
+        add_pawn_set_moves(board_state, moves, low, evasion_mask & LINE[king][low.bit_length() - 1], mode)
+        pinned_pawns ^= low
+
+    # En passant (any of our pawns that attack the target square can take). Removing two pawns from one rank
+    # can expose the king in ways the pin masks don't see, so just try it and check the king.
     ep_position = board_state.en_passant_index
-    if ep_position:
-        ep_col = ep_position % 8
-        # Can only take en passant if it's diagonally one space away (forward)
-        if is_same_rank(one_forward, ep_position) and abs(ep_col - curr_col) == 1:
-            valid_moves.append((ep_position, None))
+    if ep_position is not None and mode != GEN_QUIETS:
+        attackers = PAWN_ATTACKS[not board_state.white_to_move][ep_position] & pawns
+        while attackers:
+            low = attackers & -attackers
+            move = (low.bit_length() - 1) | ep_position << 6
+            undo = board_state.make_move(move)
+            if not is_square_attacked(board_state, king, board_state.white_to_move, board_state.occupied):
+                moves.append(move)
+            board_state.unmake_move(move, undo)
+            attackers ^= low
+
+
+def get_piece_moves(board_state: BoardState, moves: list, restrictions, mode: int = GEN_ALL,
+                    from_mask: int = FULL_BOARD):
+    # Knight, bishop, rook, queen and king moves from the attack tables
+    king, checkers, evasion_mask, pinned = restrictions
+    white = board_state.white_to_move
+    bitboards = board_state.bitboards
+    occupied = board_state.occupied
+    if mode == GEN_CAPTURES:
+        targets = board_state.occupancy[not white]
+    elif mode == GEN_QUIETS:
+        targets = ~occupied & FULL_BOARD
+    else:
+        targets = ~board_state.occupancy[white] & FULL_BOARD
+    king_targets = targets if from_mask & (1 << king) else 0
+    targets &= evasion_mask
+    knight, bishop, rook, queen, _ = "NBRQK" if white else "nbrqk"
+
+    if targets:
+        # A pinned knight can never move
+        pieces = bitboards[knight] & ~pinned & from_mask
+        while pieces:
+            low = pieces & -pieces
+            start = low.bit_length() - 1
+            add_target_moves(moves, start, KNIGHT_ATTACKS[start] & targets)
+            pieces ^= low
+
+        # Queens slide like both bishops and rooks (pinned sliders stay on the pin line)
+        pieces = (bitboards[bishop] | bitboards[queen]) & from_mask
+        while pieces:
+            low = pieces & -pieces
+            start = low.bit_length() - 1
+            attacks = BISHOP_TABLES[start][occupied & BISHOP_MASKS[start]] & targets
+            if low & pinned:
+                attacks &= LINE[king][start]
+            add_target_moves(moves, start, attacks)
+            pieces ^= low
+
+        pieces = (bitboards[rook] | bitboards[queen]) & from_mask
+        while pieces:
+            low = pieces & -pieces
+            start = low.bit_length() - 1
+            attacks = ROOK_TABLES[start][occupied & ROOK_MASKS[start]] & targets
+            if low & pinned:
+                attacks &= LINE[king][start]
+            add_target_moves(moves, start, attacks)
+            pieces ^= low
+
+    # The king can go anywhere not attacked (looking through the square it leaves, so it can't step back along a check)
+    king_targets &= KING_ATTACKS[king]
+    occupied_without_king = occupied ^ (1 << king)
+    while king_targets:
+        low = king_targets & -king_targets
+        end = low.bit_length() - 1
+        if not is_square_attacked(board_state, end, not white, occupied_without_king):
+            moves.append(king | end << 6)
+        king_targets ^= low
+
+
+def has_legal_move(board_state: BoardState) -> bool:
+    # Same rules as generate_moves, but stops at the first legal move and mostly only looks at target bitboards
+    restrictions = get_move_restrictions(board_state)
+    king, checkers, evasion_mask, pinned = restrictions
+    white = board_state.white_to_move
+    bitboards = board_state.bitboards
+    occupied = board_state.occupied
+    targets = ~board_state.occupancy[white] & FULL_BOARD
+
+    # King first (the only option in double check); castling never needs checking since the king could also
+    # just step to the square next to it
+    king_targets = KING_ATTACKS[king] & targets
+    occupied_without_king = occupied ^ (1 << king)
+    while king_targets:
+        low = king_targets & -king_targets
+        if not is_square_attacked(board_state, low.bit_length() - 1, not white, occupied_without_king):
+            return True
+        king_targets ^= low
+    targets &= evasion_mask
+    if not targets:
+        return False
 
-    return valid_moves
+    knight, bishop, rook, queen, pawn = "NBRQP" if white else "nbrqp"
+    pieces = bitboards[knight] & ~pinned
+    while pieces:
+        low = pieces & -pieces
+        if KNIGHT_ATTACKS[low.bit_length() - 1] & targets:
+            return True
+        pieces ^= low
+    for sliders, masks, tables in ((bitboards[bishop] | bitboards[queen], BISHOP_MASKS, BISHOP_TABLES),
+                                   (bitboards[rook] | bitboards[queen], ROOK_MASKS, ROOK_TABLES)):
+        while sliders:
+            low = sliders & -sliders
+            start = low.bit_length() - 1
+            attacks = tables[start][occupied & masks[start]] & targets
+            if low & pinned:
+                attacks &= LINE[king][start]
+            if attacks:
+                return True
+            sliders ^= low
+
+    # Pawns last (generated, but only pawn moves)
+    moves = []
+    get_pawn_moves(board_state, moves, restrictions)
+    return len(moves) > 0
+
+
+def is_legal_move(board_state: BoardState, move, restrictions) -> bool:
+    # Check a move from somewhere else (hash table, killers) by generating only the moving piece's moves
+    start = move & 63
+    piece = board_state.board[start]
+    if piece is None or piece.isupper() != board_state.white_to_move:
+        return False
+    return move in generate_moves(board_state, restrictions, GEN_ALL, 1 << start)
 
 
-def get_castling_moves(board_state: BoardState, is_white: bool):
+def get_castling_moves(board_state: BoardState, moves: list):
+    # Only called when not in check; the squares the king crosses must also be safe
     rights = board_state.castling_rights
-    board = board_state.board
+    occupied = board_state.occupied
+    is_white = board_state.white_to_move
     row = 7 if is_white else 0
-    valid_moves = []
+    king = row * 8 + 4
 
-    # Kingside
-    if (rights["K"] if is_white else rights["k"]):
-        f = row * 8 + 5
-        g = row * 8 + 6
-        # Middle squares are empty
-        if board[f] is None and board[g] is None:
-            valid_moves.append((g, None))  # King can move to g
+    # Kingside (f and g must be empty and not attacked)
+    if rights & (CASTLE_WHITE_KINGSIDE if is_white else CASTLE_BLACK_KINGSIDE):
+        if not occupied & (0b11 << (row * 8 + 5)):
+            if not (is_square_attacked(board_state, king + 1, not is_white, occupied)
+                    or is_square_attacked(board_state, king + 2, not is_white, occupied)):
+                moves.append(king | (row * 8 + 6) << 6)  # King can move to g
 
-    # Queenside
-    if (rights["Q"] if is_white else rights["q"]):
-        b = row * 8 + 1
-        c = row * 8 + 2
-        d = row * 8 + 3
-        # Middle squares are empty
-        if board[b] is None and board[c] is None and board[d] is None:
-            valid_moves.append((c, None))  # King can move to c
-
-    return valid_moves
+    # Queenside (b, c and d must be empty, c and d not attacked)
+    if rights & (CASTLE_WHITE_QUEENSIDE if is_white else CASTLE_BLACK_QUEENSIDE):
+        if not occupied & (0b111 << (row * 8 + 1)):
+            if not (is_square_attacked(board_state, king - 1, not is_white, occupied)
+                    or is_square_attacked(board_state, king - 2, not is_white, occupied)):
+                moves.append(king | (row * 8 + 2) << 6)  # King can move to c
 
 
 # ========== MINIMAX/EVALUATION ==========
 
-def is_terminal(state: BoardState) -> bool:
-    # Since we only have pseudo-legal moves, just check for a stalemate or 50-move rule
-    return len(state.get_all_valid_moves()) == 0 or state.halfmove_clock >= 100
-
+def terminal_score(state: BoardState, ply: int) -> int:
+    # Exact score of a terminal position: checkmate (sooner is better for the winner) or a draw
+    if state.is_in_check() and not has_legal_move(state):
+        if state.white_to_move == state.is_white_player:
+            return -MATE_SCORE + ply
+        return MATE_SCORE - ply
+    return 0
+
+
+def tablebase_score(state: BoardState, ply: int) -> int | None:
+    # Exact score from the endgame tables (mate distance counted from the root), or None without a table
+    result = probe_tablebase(state)
+    if result is None:
+        return None
+    side_to_move_wins, plies = result
+    if side_to_move_wins is None:
+        return 0
+    score = MATE_SCORE - ply - plies
+    if side_to_move_wins != (state.white_to_move == state.is_white_player):
+        score = -score
+    return score
+
+
+def evaluate_heuristic(state: BoardState) -> int:
+    # Material, center control and development for the player we are searching for, read from the running
+    # totals make_move keeps (in centipawns), plus a tempo bonus to make the bot more aggressive
+    if state.is_white_player:
+        return state.eval_balance + state.white_development + TEMPO_BONUS
+    return -state.eval_balance + state.black_development + TEMPO_BONUS
+
+
+def dynamic_depth(state: BoardState, num_moves: int | None = None) -> int:
+    if num_moves is None:
+        num_moves = len(state.get_all_valid_moves())
+    if num_moves <= 5:
+        return 4
+    else:
+        return 3
 
-def apply_move(state: BoardState, move):
-    # Unpack the move
-    start_idx, end_idx, promotion = move
-    board = state.board
-    moving_piece = board[start_idx]
-    lower = moving_piece.lower()
-    is_white = moving_piece.isupper()
-    start_row, start_col = start_idx // 8, start_idx % 8
-    end_row, end_col = end_idx // 8, end_idx % 8
 
-    # Handle promotion
-    if promotion:
-        board[end_idx] = promotion.upper() if is_white else promotion.lower()
+# Deepest ply the per-ply search tables cover
+MAX_PLY = 64
+
+# Deepest iteration a timed search will start
+MAX_SEARCH_DEPTH = 32
+
+# How many nodes to search between clock checks
+TIME_CHECK_INTERVAL = 1024
+
+# Move ordering priorities (quiet moves are ordered by their history score, which stays below these)
+PV_MOVE_SCORE = 3_000_000
+HASH_MOVE_SCORE = 2_000_000
+CAPTURE_SCORE = 1_000_000
+KILLER_SCORES = (900_000, 800_000)
+HISTORY_LIMIT = 500_000
+
+# Aspiration windows: from this depth on, each iteration starts with a window this wide either side of the
+# previous score, doubling on every fail (and falling back to an open window past the limit)
+ASPIRATION_MIN_DEPTH = 4
+ASPIRATION_WINDOW = 25
+ASPIRATION_LIMIT = 400
+
+# Null-move pruning: search a pass this much shallower (one more from NULL_MOVE_DEEP_DEPTH on)
+NULL_MOVE_MIN_DEPTH = 3
+NULL_MOVE_REDUCTION = 2
+NULL_MOVE_DEEP_DEPTH = 6
+
+# Late move reductions: quiet moves from this far down the ordering are searched shallower first
+LMR_MIN_DEPTH = 3
+LMR_MIN_MOVES = 3
+LMR_DEEP_MOVES = 8
+
+# Futility pruning: near the leaves, quiet moves are skipped if the static score is this far on the wrong
+# side of the window (indexed by remaining depth)
+FUTILITY_MARGINS = (0, 150, 300)
+
+# Quiescence delta pruning: skip captures that can't reach alpha even with this much to spare
+DELTA_MARGIN = 200
+PROMOTION_GAIN = (PIECE_VALUES["q"] - PIECE_VALUES["p"]) * 100
+CAPTURE_GAINS = {piece: PIECE_VALUES[piece.lower()] * 100 for piece in PIECE_CHARS}
+
+# Static exchange evaluation: piece values (a king is worth more than anything it could win, so it only ever
+# takes last), and losing captures are pruned near the leaves when they lose more than this per ply of depth
+SEE_VALUES = {**CAPTURE_GAINS, "K": 20_000, "k": 20_000}
+SEE_PRUNING_DEPTH = 3
+SEE_PRUNING_MARGIN = 100
+
+# Victim/attacker ranks for most-valuable-victim/least-valuable-attacker capture ordering
+ORDERING_VALUES = {"p": 1, "n": 2, "b": 3, "r": 4, "q": 5, "k": 6}
+PIECE_ORDERING_VALUES = {piece: ORDERING_VALUES[piece.lower()] for piece in PIECE_CHARS}
+
+
+class SearchContext:
+    # State shared by every node of a search (and kept between iterative-deepening iterations)
+    def __init__(self, tt_size_mb: float = 16, null_move: bool = True, late_move_reductions: bool = True,
+                 futility_pruning: bool = True, see_pruning: bool = True):
+        self.tt = TranspositionTable(tt_size_mb)
+
+        # Selective search switches (turn them off to benchmark against the plain search)
+        self.null_move = null_move
+        self.late_move_reductions = late_move_reductions
+        self.futility_pruning = futility_pruning
+        self.see_pruning = see_pruning
+
+        # Pick at random between equally scored root moves (off for reproducible runs: the first one in order wins)
+        self.random_ties = True
+
+        # Move ordering: principal variation of the previous iteration, two killer moves per ply,
+        # and a butterfly history table indexed by the move's start and end bits
+        self.pv = []
+        self.pv_hash = None  # Hash of the position the PV starts from
+        self.follow_pv = False
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = [0] * 4096
+
+        # Node count and cooperative abort (set once the clock passes the deadline or the node limit is reached)
+        self.nodes = 0
+        self.deadline = None
+        self.max_nodes = None
+        self.stopped = False
+
+        # Called as iteration_callback(depth, score, context) after every completed iteration (UCI info output)
+        self.iteration_callback = None
+
+        # Running counters for the statistics (SearchStats splits them up per depth)
+        self.leaf_evals = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.stats = SearchStats()
+
+    def selectivity(self) -> tuple:
+        return self.null_move, self.late_move_reductions, self.futility_pruning, self.see_pruning
+
+    def check_time(self):
+        # Called every node; only looks at the clock and the node limit every TIME_CHECK_INTERVAL nodes
+        self.nodes += 1
+        if self.nodes % TIME_CHECK_INTERVAL == 0:
+            if self.deadline is not None and time.perf_counter() >= self.deadline:
+                self.stopped = True
+            elif self.max_nodes is not None and self.nodes >= self.max_nodes:
+                self.stopped = True
+        return self.stopped
+
+    def new_search(self):
+        # Killers only make sense for the previous position, but history is still a good hint (so just age it).
+        # The PV is left alone: whoever owns the context keeps it lined up with the new root (see Engine.sync).
+        self.tt.new_search()
+        self.nodes = 0
+        self.deadline = None
+        self.max_nodes = None
+        self.stopped = False
+        self.leaf_evals = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.stats = SearchStats()
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = [score // 2 for score in self.history]
+
+
+def score_to_tt(score: int, ply: int) -> int:
+    # Mate scores are stored as the distance from this node, so they stay right when reached at another ply
+    if score >= MATE_THRESHOLD:
+        return score + ply
+    if score <= -MATE_THRESHOLD:
+        return score - ply
+    return score
+
+
+def score_from_tt(score: int, ply: int) -> int:
+    if score >= MATE_THRESHOLD:
+        return score - ply
+    if score <= -MATE_THRESHOLD:
+        return score + ply
+    return score
+
+
+def probe_transposition(context: SearchContext, state: BoardState, alpha: float, beta: float, depth: int, ply: int):
+    # Returns (cutoff score or None, stored best move or None)
+    entry = context.tt.probe(state.hash)
+    if entry is None:
+        return None, None
+    entry_depth, score, bound, move = entry
+    score = score_from_tt(score, ply)
+    if state.white_to_move != state.is_white_player:
+        score = -score
+        bound = FLIPPED_BOUNDS[bound]
+    hash_move = move if move else None
+    if entry_depth >= depth:
+        if bound == BOUND_EXACT or (bound == BOUND_LOWER and score >= beta) or (bound == BOUND_UPPER and score <= alpha):
+            return score, hash_move
+    return None, hash_move
+
+
+def store_transposition(context: SearchContext, state: BoardState, alpha: float, beta: float, depth: int, ply: int,
+                        score: int, best_move):
+    # Bound type from where the score fell relative to the original window
+    if score <= alpha:
+        bound = BOUND_UPPER
+    elif score >= beta:
+        bound = BOUND_LOWER
     else:
-        board[end_idx] = moving_piece
-
-    board[start_idx] = None
-
-    if lower == "p":
-        # Handle en passant
-        if end_idx == state.en_passant_index:
-            # Clear the pawn that was captured
-            capture_idx = end_idx + (8 if is_white else -8)
-            board[capture_idx] = None
-
-        # Reset en passant then check for double pawn move
-        state.en_passant_target = None
-        state.en_passant_index = None
-        if abs(end_row - start_row) == 2:
-            # Double pawn move
-            ep_row = (start_row + end_row) // 2
-            ep_idx = ep_row * 8 + start_col
-            state.en_passant_index = ep_idx
-            state.en_passant_target = index_to_square(ep_idx)
-
-    # Handle castling
-    if lower == "k":
-        if start_col == 4:
-            # Kingside
-            if end_col == 6:
-                # Move the rook left two
-                rook_from = start_idx + 3
-                rook_to = start_idx + 1
-                board[rook_to] = board[rook_from]
-                board[rook_from] = None
-            # Queenside
-            elif end_col == 2:
-                # Move the rook right three
-                rook_from = start_idx - 4
-                rook_to = start_idx - 1
-                board[rook_to] = board[rook_from]
-                board[rook_from] = None
-
-    # Update castling rights
-    # Check if a king moved
-    if lower == "k":
-        if is_white:
-            state.castling_rights['K'] = False
-            state.castling_rights['Q'] = False
-        else:
-            state.castling_rights['k'] = False
-            state.castling_rights['q'] = False
-    # Check if a rook moved
-    elif moving_piece == 'R':
-        if start_idx == 63:  # h1
-            state.castling_rights['K'] = False
-        elif start_idx == 56:  # a1
-            state.castling_rights['Q'] = False
-    elif moving_piece == 'r':
-        if start_idx == 7:  # h8
-            state.castling_rights['k'] = False
-        elif start_idx == 0:  # a8
-            state.castling_rights['q'] = False
-
-    # Update turn
-    state.white_to_move = not state.white_to_move
-
-    # Increment fullmoves after black move
-    if not state.white_to_move:
-        state.fullmove_number += 1
-
-    # Update halfmoves
-    if lower == "p" or board[end_idx] is not None:
-        state.halfmove_clock = 0
+        bound = BOUND_EXACT
+    # Search scores are for is_white_player, but the table keeps them for the side to move, so its entries stay
+    # right when the same context later searches for the other player
+    if state.white_to_move != state.is_white_player:
+        score = -score
+        bound = FLIPPED_BOUNDS[bound]
+    context.tt.store(state.hash, depth, score_to_tt(score, ply), bound, best_move or 0)
+
+
+def extract_pv(state: BoardState, context: SearchContext, max_length: int) -> list:
+    # Follow the stored best moves from this position to rebuild the principal variation
+    pv = []
+    undos = []
+    while len(pv) < max_length:
+        entry = context.tt.probe(state.hash)
+        if entry is None or not entry[3]:
+            break
+        move = entry[3]
+        if move not in state.get_all_valid_moves():
+            break  # Hash collision
+        pv.append(move)
+        undos.append(state.make_move(move))
+    for move, undo in zip(reversed(pv), reversed(undos)):
+        state.unmake_move(move, undo)
+    return pv
+
+
+# ========== STATIC EXCHANGE ==========
+
+def static_exchange(state: BoardState, move: int) -> int:
+    # Material (centipawns) the side to move comes out ahead by if both sides keep recapturing on the target
+    # square with their least valuable piece, each stopping whenever that's better for them (pins are ignored).
+    # Works on occupancy masks only: removing a capturer from occupied uncovers the sliders behind it.
+    board = state.board
+    bitboards = state.bitboards
+    occupancy = state.occupancy
+    start = move & 63
+    end = (move >> 6) & 63
+    occupied = state.occupied ^ (1 << start)
+    victim = board[end]
+    if victim is not None:
+        gain = SEE_VALUES[victim]
+    elif end == state.en_passant_index and board[start] in ("P", "p"):
+        gain = SEE_VALUES["p"]
+        occupied ^= 1 << (end + (8 if state.white_to_move else -8))
     else:
-        state.halfmove_clock += 1
-
+        gain = 0
+    on_square = SEE_VALUES[board[start]]
+    if move >> PROMOTION_SHIFT:
+        promoted = SEE_VALUES[PROMOTED_PIECES[True][move >> PROMOTION_SHIFT]]
+        gain += promoted - on_square
+        on_square = promoted
+
+    # gains[n] is what the side making the nth capture is up if the exchange stopped right after it
+    gains = [gain]
+    white = not state.white_to_move
+    attackers = (attackers_to(state, end, True, occupied) | attackers_to(state, end, False, occupied)) & occupied
+    while attackers & occupancy[white]:
+        own = attackers & occupancy[white]
+        for piece in ("PNBRQK" if white else "pnbrqk"):
+            pieces = own & bitboards[piece]
+            if pieces:
+                break
+        gains.append(on_square - gains[-1])
+        on_square = SEE_VALUES[piece]
+        occupied ^= pieces & -pieces
+        attackers = (attackers_to(state, end, True, occupied) | attackers_to(state, end, False, occupied)) & occupied
+        white = not white
 
-def evaluate_heuristic(state: BoardState) -> float:
-    playing_white = state.is_white_player
-    evaluation = 0
+    # Walk back: each side only makes its capture if that beats stopping before it
+    for index in range(len(gains) - 1, 0, -1):
+        gains[index - 1] = -max(-gains[index - 1], gains[index])
+    return gains[0]
 
-    # Helper function
-    def is_mine(piece: str | None) -> bool:
-        return (piece.isupper() and playing_white) or (piece.islower() and not playing_white)
 
-    # Material (difference between white and black)
-    for square in state.board:
-        if square is not None:
-            if is_mine(square):
-                evaluation += PIECE_VALUES[square.lower()]
-            else:
-                evaluation -= PIECE_VALUES[square.lower()]
-
-    # Center control
-    center_squares = [27, 35, 36, 28]  # (d4, d5, e4, e5)
-    for square in center_squares:
-        piece = state.board[square]
-        if piece is not None:
-            if is_mine(piece):
-                evaluation += 0.3
-            else:
-                evaluation -= 0.3
-
-    for i, piece in enumerate(state.board):
-        if piece is None or not is_mine(piece):
-            continue
-        row = i // 8
+def is_losing_capture(state: BoardState, move: int, threshold: int = 0) -> bool:
+    # Whether the exchange comes out below threshold (<= 0). Taking something worth at least the capturer (or
+    # with the king, which only takes undefended pieces) can't lose material, so those skip the full exchange.
+    board = state.board
+    attacker = board[move & 63]
+    victim = board[(move >> 6) & 63]
+    if attacker in ("K", "k") or (victim is not None and SEE_VALUES[victim] >= SEE_VALUES[attacker]):
+        return False
+    return static_exchange(state, move) < threshold
 
-        # Reward development
-        if piece.lower() in ["n", "b"]:
-            # Reward knights and bishops for leaving the back rank
-            if (playing_white and row <= 5) or (not playing_white and row >= 2):
-                evaluation += 0.2
 
-    # 6. Tempo bonus (slight bonus for turn player to make the bot more aggressive)
-    evaluation += 0.05
+# ========== MOVE ORDERING ==========
 
-    return round(evaluation, 6)  # Fix floating point error
+def is_capture(state: BoardState, move: int) -> bool:
+    end = (move >> 6) & 63
+    if state.board[end] is not None:
+        return True
+    # En passant
+    return end == state.en_passant_index and state.board[move & 63] in ("P", "p")
 
 
-def get_next_state(state: BoardState, move: str) -> BoardState:
-    next_state = state.copy()
-    apply_move(next_state, move)
-    return next_state
+def order_moves(state: BoardState, moves: list, ply: int, context: SearchContext, hash_move) -> list:
+    # Sort moves best-first: PV move, hash move, captures (MVV-LVA) and queen promotions, killers, then history
+    board = state.board
+    ep_index = state.en_passant_index
+    history = context.history
+    killer_1, killer_2 = context.killers[ply] if ply < MAX_PLY else (None, None)
+    pv_move = None
+    if context.follow_pv:
+        if ply < len(context.pv) and context.pv[ply] in moves:
+            pv_move = context.pv[ply]
+        else:
+            context.follow_pv = False
+
+    def score(move):
+        if move == pv_move:
+            return PV_MOVE_SCORE
+        if move == hash_move:
+            return HASH_MOVE_SCORE
+        start = move & 63
+        end = (move >> 6) & 63
+        victim = board[end]
+        if victim is not None:
+            return CAPTURE_SCORE + 10 * PIECE_ORDERING_VALUES[victim] - PIECE_ORDERING_VALUES[board[start]]
+        if end == ep_index and board[start] in ("P", "p"):
+            return CAPTURE_SCORE + 9
+        if move >= QUEEN_PROMOTION:  # (the queen has the highest promotion code)
+            return CAPTURE_SCORE
+        if move == killer_1:
+            return KILLER_SCORES[0]
+        if move == killer_2:
+            return KILLER_SCORES[1]
+        return history[move & MOVE_SQUARES_MASK]
+
+    moves.sort(key=score, reverse=True)
+    return moves
+
+
+def order_captures(state: BoardState, moves: list) -> list:
+    # Most valuable victim first, then least valuable attacker (en passant and plain promotions count as taking a pawn)
+    board = state.board
 
+    def score(move):
+        victim = board[(move >> 6) & 63]
+        return 10 * (PIECE_ORDERING_VALUES[victim] if victim is not None else 1) - PIECE_ORDERING_VALUES[board[move & 63]]
 
-def is_test_end(state: BoardState, depth: int) -> bool:
-    return is_terminal(state) or depth == 0
+    moves.sort(key=score, reverse=True)
+    return moves
 
 
-def dynamic_depth(state: BoardState) -> int:
-    num_moves = len(state.get_all_valid_moves())
-    if num_moves <= 5:
-        return 4
+def capture_gain(state: BoardState, move: int) -> int:
+    # Most material a capture (or promotion) can win
+    victim = state.board[(move >> 6) & 63]
+    promotion = move >> PROMOTION_SHIFT
+    if victim is not None:
+        gain = CAPTURE_GAINS[victim]
     else:
-        return 3
-
-
-def max_value(state: BoardState, alpha: float, beta: float, depth: int) -> float:
-    if is_test_end(state, depth):
-        return evaluate_heuristic(state)
+        gain = 0 if promotion else CAPTURE_GAINS["p"]  # Plain promotion or en passant
+    if promotion:
+        gain += PROMOTION_GAIN
+    return gain
+
+
+def generate_staged_moves(state: BoardState, ply: int, context: SearchContext, hash_move):
+    # Yield moves lazily, best stages first: PV/hash move, captures that don't lose material (MVV-LVA), killers,
+    # quiet moves by history, then losing captures. Each stage is only generated when the previous one ran out
+    # without a cutoff.
+    restrictions = get_move_restrictions(state)
+    searched = []
+
+    # Stage 1: the previous iteration's PV move and the hash move (validated, since they come from elsewhere)
+    pv_move = None
+    if context.follow_pv:
+        if ply < len(context.pv) and is_legal_move(state, context.pv[ply], restrictions):
+            pv_move = context.pv[ply]
+        else:
+            context.follow_pv = False
+    for move in (pv_move, hash_move):
+        if move is not None and move not in searched and (move is pv_move or is_legal_move(state, move, restrictions)):
+            searched.append(move)
+            yield move
+
+    # Stage 2: captures and queen promotions (the ones that lose material in the exchange are kept for last)
+    losing_captures = []
+    for move in order_captures(state, generate_moves(state, restrictions, GEN_CAPTURES)):
+        if move in searched:
+            continue
+        if is_losing_capture(state, move):
+            losing_captures.append(move)
+        else:
+            yield move
+
+    # Stage 3: killer moves (only while they are still quiet and legal here)
+    if ply < MAX_PLY:
+        for move in list(context.killers[ply]):
+            if (move is not None and move not in searched and not is_capture(state, move)
+                    and is_legal_move(state, move, restrictions)):
+                searched.append(move)
+                yield move
+
+    # Stage 4: everything else
+    history = context.history
+    quiets = generate_moves(state, restrictions, GEN_QUIETS)
+    quiets.sort(key=lambda move: history[move & MOVE_SQUARES_MASK], reverse=True)
+    for move in quiets:
+        if move not in searched:
+            yield move
+
+    # Stage 5: losing captures
+    yield from losing_captures
+
+
+def record_cutoff(state: BoardState, move: int, depth: int, ply: int, context: SearchContext):
+    # A quiet move caused a beta cutoff: remember it as a killer for this ply and reward it in the history table
+    if move >> PROMOTION_SHIFT or is_capture(state, move):
+        return
+    if ply < MAX_PLY:
+        killers = context.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+    index = move & MOVE_SQUARES_MASK
+    context.history[index] += depth * depth
+    if context.history[index] > HISTORY_LIMIT:
+        # Keep history scores below the killer/capture priorities
+        context.history = [score // 2 for score in context.history]
+
+
+# ========== SELECTIVITY ==========
+
+def has_non_pawn_material(state: BoardState) -> bool:
+    # Null moves are unsafe with only king and pawns left (zugzwang is common there)
+    bitboards = state.bitboards
+    if state.white_to_move:
+        return (bitboards["N"] | bitboards["B"] | bitboards["R"] | bitboards["Q"]) != 0
+    return (bitboards["n"] | bitboards["b"] | bitboards["r"] | bitboards["q"]) != 0
+
+
+def null_move_reduction(depth: int) -> int:
+    return NULL_MOVE_REDUCTION + (1 if depth >= NULL_MOVE_DEEP_DEPTH else 0)
+
+
+def late_move_reduction(depth: int, move_number: int) -> int:
+    return 2 if move_number >= LMR_DEEP_MOVES and depth > LMR_MIN_DEPTH + 1 else 1
+
+
+# ========== SEARCH ==========
+
+def max_value(state: BoardState, alpha: float, beta: float, depth: int, ply: int, context: SearchContext,
+              allow_null: bool = True) -> int:
+    if context.check_time():
+        return 0  # Aborted (the caller throws this iteration away)
+    if loaded_tables and state.occupied.bit_count() <= TABLEBASE_MAX_PIECES:
+        tb_score = tablebase_score(state, ply)
+        if tb_score is not None:
+            return tb_score
+    if depth == 0:
+        return quiescence_max(state, alpha, beta, ply, context)
+    if state.halfmove_clock >= 100:
+        return terminal_score(state, ply)
+    tt_score, hash_move = probe_transposition(context, state, alpha, beta, depth, ply)
+    if tt_score is not None:
+        return tt_score
+
+    # Selectivity: null-move and futility pruning only in null-window nodes, so the PV keeps exact scores
+    in_check = state.is_in_check()
+    futility_score = None
+    if beta - alpha == 1 and not in_check:
+        static_score = evaluate_heuristic(state)
+        if (context.null_move and allow_null and depth >= NULL_MOVE_MIN_DEPTH and static_score >= beta
+                and has_non_pawn_material(state)):
+            # Even passing the turn keeps us above beta, so a real move almost certainly would too
+            undo = state.make_null_move()
+            score = min_value(state, beta - 1, beta, max(0, depth - 1 - null_move_reduction(depth)), ply + 1,
+                              context, False)
+            state.unmake_null_move(undo)
+            if context.stopped:
+                return 0
+            if score >= beta:
+                return beta if score >= MATE_THRESHOLD else score
+        if context.futility_pruning and depth < len(FUTILITY_MARGINS) and static_score + FUTILITY_MARGINS[depth] <= alpha:
+            futility_score = static_score + FUTILITY_MARGINS[depth]
+    late_moves = context.late_move_reductions and depth >= LMR_MIN_DEPTH and not in_check
+    see_threshold = None
+    if context.see_pruning and beta - alpha == 1 and not in_check and depth <= SEE_PRUNING_DEPTH:
+        see_threshold = -SEE_PRUNING_MARGIN * depth
+    killers = context.killers[ply] if ply < MAX_PLY else ()
+
+    alpha_orig = alpha
     v = -math.inf
-    for move in state.get_all_valid_moves():
-        v = max(v, min_value(get_next_state(state, move), alpha, beta, depth - 1))
+    best_move = None
+    for move_number, move in enumerate(generate_staged_moves(state, ply, context, hash_move)):
+        # Near the leaves, captures that lose too much in the exchange aren't searched at all
+        if (see_threshold is not None and move_number > 0 and is_capture(state, move)
+                and is_losing_capture(state, move, see_threshold)):
+            continue
+        # Quiet moves late in the ordering (or any quiet move in a futile node) are searched less, unless they check
+        selective = ((futility_score is not None or (late_moves and move_number >= LMR_MIN_MOVES)) and move_number > 0
+                     and move < 1 << PROMOTION_SHIFT and not is_capture(state, move) and move not in killers)
+        undo = state.make_move(move)
+        reduction = 0
+        if selective and not state.is_in_check():
+            if futility_score is not None:
+                state.unmake_move(move, undo)
+                v = max(v, futility_score)
+                continue
+            reduction = late_move_reduction(depth, move_number)
+        if move_number == 0:
+            score = min_value(state, alpha, beta, depth - 1, ply + 1, context)
+        else:
+            # Principal variation search: a null window only proves the move can't beat alpha,
+            # and it is searched again with the full window if it unexpectedly does
+            score = min_value(state, alpha, alpha + 1, depth - 1 - reduction, ply + 1, context)
+            if reduction and score > alpha:
+                # The reduced search was fooled, so check at full depth
+                score = min_value(state, alpha, alpha + 1, depth - 1, ply + 1, context)
+            if alpha < score < beta:
+                score = min_value(state, alpha, beta, depth - 1, ply + 1, context)
+        state.unmake_move(move, undo)
+        context.follow_pv = False
+        if context.stopped:
+            return 0
+        if score > v:
+            v = score
+            best_move = move
         alpha = max(alpha, v)
         if v >= beta:
+            context.cutoffs += 1
+            if move_number == 0:
+                context.first_move_cutoffs += 1
+            record_cutoff(state, move, depth, ply, context)
             break
+    if best_move is None:
+        return terminal_score(state, ply)  # No legal moves
+    store_transposition(context, state, alpha_orig, beta, depth, ply, v, best_move)
     return v
 
 
-def min_value(state: BoardState, alpha: float, beta: float, depth: int) -> float:
-    if is_test_end(state, depth):
-        return evaluate_heuristic(state)
+def min_value(state: BoardState, alpha: float, beta: float, depth: int, ply: int, context: SearchContext,
+              allow_null: bool = True) -> int:
+    if context.check_time():
+        return 0  # Aborted (the caller throws this iteration away)
+    if loaded_tables and state.occupied.bit_count() <= TABLEBASE_MAX_PIECES:
+        tb_score = tablebase_score(state, ply)
+        if tb_score is not None:
+            return tb_score
+    if depth == 0:
+        return quiescence_min(state, alpha, beta, ply, context)
+    if state.halfmove_clock >= 100:
+        return terminal_score(state, ply)
+    tt_score, hash_move = probe_transposition(context, state, alpha, beta, depth, ply)
+    if tt_score is not None:
+        return tt_score
+
+    in_check = state.is_in_check()
+    futility_score = None
+    if beta - alpha == 1 and not in_check:
+        static_score = evaluate_heuristic(state)
+        if (context.null_move and allow_null and depth >= NULL_MOVE_MIN_DEPTH and static_score <= alpha
+                and has_non_pawn_material(state)):
+            undo = state.make_null_move()
+            score = max_value(state, alpha, alpha + 1, max(0, depth - 1 - null_move_reduction(depth)), ply + 1,
+                              context, False)
+            state.unmake_null_move(undo)
+            if context.stopped:
+                return 0
+            if score <= alpha:
+                return alpha if score <= -MATE_THRESHOLD else score
+        if context.futility_pruning and depth < len(FUTILITY_MARGINS) and static_score - FUTILITY_MARGINS[depth] >= beta:
+            futility_score = static_score - FUTILITY_MARGINS[depth]
+    late_moves = context.late_move_reductions and depth >= LMR_MIN_DEPTH and not in_check
+    see_threshold = None
+    if context.see_pruning and beta - alpha == 1 and not in_check and depth <= SEE_PRUNING_DEPTH:
+        see_threshold = -SEE_PRUNING_MARGIN * depth
+    killers = context.killers[ply] if ply < MAX_PLY else ()
+
+    beta_orig = beta
     v = math.inf
-    for move in state.get_all_valid_moves():
-        v = min(v, max_value(get_next_state(state, move), alpha, beta, depth - 1))
+    best_move = None
+    for move_number, move in enumerate(generate_staged_moves(state, ply, context, hash_move)):
+        if (see_threshold is not None and move_number > 0 and is_capture(state, move)
+                and is_losing_capture(state, move, see_threshold)):
+            continue
+        selective = ((futility_score is not None or (late_moves and move_number >= LMR_MIN_MOVES)) and move_number > 0
+                     and move < 1 << PROMOTION_SHIFT and not is_capture(state, move) and move not in killers)
+        undo = state.make_move(move)
+        reduction = 0
+        if selective and not state.is_in_check():
+            if futility_score is not None:
+                state.unmake_move(move, undo)
+                v = min(v, futility_score)
+                continue
+            reduction = late_move_reduction(depth, move_number)
+        if move_number == 0:
+            score = max_value(state, alpha, beta, depth - 1, ply + 1, context)
+        else:
+            score = max_value(state, beta - 1, beta, depth - 1 - reduction, ply + 1, context)
+            if reduction and score < beta:
+                score = max_value(state, beta - 1, beta, depth - 1, ply + 1, context)
+            if alpha < score < beta:
+                score = max_value(state, alpha, beta, depth - 1, ply + 1, context)
+        state.unmake_move(move, undo)
+        context.follow_pv = False
+        if context.stopped:
+            return 0
+        if score < v:
+            v = score
+            best_move = move
         beta = min(beta, v)
         if v <= alpha:
+            context.cutoffs += 1
+            if move_number == 0:
+                context.first_move_cutoffs += 1
+            record_cutoff(state, move, depth, ply, context)
             break
+    if best_move is None:
+        return terminal_score(state, ply)  # No legal moves
+    store_transposition(context, state, alpha, beta_orig, depth, ply, v, best_move)
+    return v
+
+
+def quiescence_max(state: BoardState, alpha: float, beta: float, ply: int, context: SearchContext) -> int:
+    # Only search captures until the position is quiet, so leaves aren't scored in the middle of an exchange
+    if context.check_time():
+        return 0
+    if loaded_tables and state.occupied.bit_count() <= TABLEBASE_MAX_PIECES:
+        tb_score = tablebase_score(state, ply)
+        if tb_score is not None:
+            return tb_score
+    if state.is_in_check():
+        # No standing pat in check: every evasion gets searched (and having none is checkmate)
+        moves = state.get_all_valid_moves()
+        if not moves:
+            return terminal_score(state, ply)
+        stand_pat = math.inf
+        v = -math.inf
+        prune_losing = False
+    else:
+        # Stand pat: we don't have to capture, so the static score is a lower bound
+        stand_pat = evaluate_heuristic(state)
+        context.leaf_evals += 1
+        if stand_pat >= beta:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+        v = stand_pat
+        moves = state.get_all_captures()
+        prune_losing = context.see_pruning
+    for move in order_captures(state, moves):
+        # Delta pruning: even winning the captured piece outright can't bring the score up to alpha
+        if stand_pat + capture_gain(state, move) + DELTA_MARGIN <= alpha:
+            continue
+        # A capture that loses material in the exchange can't do better than standing pat
+        if prune_losing and is_losing_capture(state, move):
+            continue
+        undo = state.make_move(move)
+        score = quiescence_min(state, alpha, beta, ply + 1, context)
+        state.unmake_move(move, undo)
+        if context.stopped:
+            return 0
+        if score > v:
+            v = score
+            if v >= beta:
+                break
+            alpha = max(alpha, v)
+    return v
+
+
+def quiescence_min(state: BoardState, alpha: float, beta: float, ply: int, context: SearchContext) -> int:
+    if context.check_time():
+        return 0
+    if loaded_tables and state.occupied.bit_count() <= TABLEBASE_MAX_PIECES:
+        tb_score = tablebase_score(state, ply)
+        if tb_score is not None:
+            return tb_score
+    if state.is_in_check():
+        moves = state.get_all_valid_moves()
+        if not moves:
+            return terminal_score(state, ply)
+        stand_pat = -math.inf
+        v = math.inf
+        prune_losing = False
+    else:
+        # Stand pat: the opponent doesn't have to capture, so the static score is an upper bound
+        stand_pat = evaluate_heuristic(state)
+        context.leaf_evals += 1
+        if stand_pat <= alpha:
+            return stand_pat
+        beta = min(beta, stand_pat)
+        v = stand_pat
+        moves = state.get_all_captures()
+        prune_losing = context.see_pruning
+    for move in order_captures(state, moves):
+        # Delta pruning: even winning the captured piece outright can't bring the score down to beta
+        if stand_pat - capture_gain(state, move) - DELTA_MARGIN >= beta:
+            continue
+        if prune_losing and is_losing_capture(state, move):
+            continue
+        undo = state.make_move(move)
+        score = quiescence_max(state, alpha, beta, ply + 1, context)
+        state.unmake_move(move, undo)
+        if context.stopped:
+            return 0
+        if score < v:
+            v = score
+            if v <= alpha:
+                break
+            beta = min(beta, v)
     return v
 
 
-def depth_limited_alpha_beta_id_minimax(state: BoardState) -> str:
+def score_root_move(state: BoardState, move, depth: int, context: SearchContext, alpha: float, beta: float,
+                    first: bool = False):
+    # Score one root move inside (alpha, beta): the first move gets the whole window, later ones a null window
+    # first and the whole window only if they turn out better than alpha
+    undo = state.make_move(move)
+    if first:
+        score = min_value(state, alpha, beta, depth - 1, 1, context)
+    else:
+        score = min_value(state, alpha, alpha + 1, depth - 1, 1, context)
+        if alpha < score < beta:
+            score = min_value(state, alpha, beta, depth - 1, 1, context)
+    state.unmake_move(move, undo)
+    context.follow_pv = False
+    return score
+
+
+def search_root_moves(state: BoardState, moves: list, depth: int, context: SearchContext,
+                      alpha: float = -math.inf, beta: float = math.inf):
+    # Score root moves one after another, returning (best score, every move with that score).
+    # A best score <= alpha or >= beta means the window was wrong (and the scores are only bounds).
+    best_score = -math.inf
+    best_moves = []
+    for move in moves:
+        # Only moves at least as good as the best so far need an exact score (scores are integers,
+        # so an alpha one below the best still separates ties for the random choice from worse moves)
+        score = score_root_move(state, move, depth, context, max(alpha, best_score - 1), beta, not best_moves)
+        if context.stopped:
+            break
+        if score > best_score:
+            best_score = score
+            best_moves = [move]
+        elif score == best_score:
+            best_moves.append(move)
+        if best_score >= beta:
+            break
+    return best_score, best_moves
+
+
+def depth_limited_alpha_beta_id_minimax(state: BoardState, context: SearchContext | None = None,
+                                        time_manager: TimeManager | None = None, parallel=None) -> str:
+    if context is None:
+        context = SearchContext()
+    context.new_search()
+    # The root moves are generated once and only re-ordered between iterations
+    root_moves = state.get_all_valid_moves()
+    if not root_moves:
+        return None  # Checkmate or stalemate
+    # Fixed depth, or keep deepening until the time budget runs out
+    target_depth = dynamic_depth(state, len(root_moves)) if time_manager is None else MAX_SEARCH_DEPTH
     depth = 1
-    target_depth = dynamic_depth(state)
     best_move = None
-    # print("Starting minimax...")
+    previous_score = None
     # Iterative deepening
     while depth <= target_depth:
-        # print("Search depth:", depth)
-        best_score = -math.inf
-        best_moves = []
-        # Find the move with the best score
-        for move in state.get_all_valid_moves():
-            score = min_value(get_next_state(state, move), -math.inf, math.inf, depth - 1)
-            # print("Move:", move, "Score:", score)
-            if score > best_score:
-                best_score = score
-                best_moves = [move]
-                # print("New best move at depth", depth, "is", move, "with score", score)
-            elif score == best_score:
-                best_moves.append(move)
-        # print("Best moves at depth", depth, "are", best_moves)
-        best_move = random.choice(best_moves)
+        # Don't start an iteration that can't finish in time (but always complete depth 1)
+        if time_manager is not None and best_move is not None and not time_manager.should_start_iteration():
+            break
+        # Search the previous iteration's principal variation first
+        context.follow_pv = True
+        root_moves = order_moves(state, root_moves, 0, context, best_move)
+        # Aspiration window around the last score (mate scores are too jumpy to guess a window for)
+        window = ASPIRATION_WINDOW
+        if depth >= ASPIRATION_MIN_DEPTH and previous_score is not None and abs(previous_score) < MATE_THRESHOLD:
+            alpha, beta = previous_score - window, previous_score + window
+        else:
+            alpha, beta = -math.inf, math.inf
+        # Find the move with the best score, widening the window until the score lands inside it
+        while True:
+            if parallel is not None and parallel.should_split(depth, len(root_moves)):
+                best_score, best_moves = parallel.search_root_moves(state, root_moves, depth, context, alpha, beta)
+            else:
+                best_score, best_moves = search_root_moves(state, root_moves, depth, context, alpha, beta)
+            if context.stopped or alpha < best_score < beta:
+                break
+            window *= 2
+            if best_score <= alpha:
+                alpha = previous_score - window if window <= ASPIRATION_LIMIT else -math.inf
+            else:
+                beta = previous_score + window if window <= ASPIRATION_LIMIT else math.inf
+            # Search the moves again, best first
+            context.follow_pv = True
+            root_moves = order_moves(state, root_moves, 0, context, best_moves[0] if best_moves else best_move)
+        if context.stopped:
+            # Out of time partway through, so keep the move from the last completed depth
+            context.stats.record_depth(depth, context, None, None, completed=False)
+            break
+        best_move = random.choice(best_moves) if context.random_ties else best_moves[0]
+        previous_score = best_score
+        context.stats.record_depth(depth, context, best_score, move_to_uci(best_move))
+        store_transposition(context, state, -math.inf, math.inf, depth, 0, best_score, best_move)
+        context.pv = extract_pv(state, context, depth)
+        context.pv_hash = state.hash
+        if context.iteration_callback is not None:
+            context.iteration_callback(depth, best_score, context)
+        if time_manager is not None:
+            # Depth 1 always completes, after that the running iteration can be aborted
+            context.deadline = time_manager.deadline
+            context.max_nodes = time_manager.max_nodes
         depth += 1
     return best_move
 
 
 # ========== HELPERS ==========
 
-def is_on_board(position: int):
-    return 0 <= position < 64
+def square_to_index(square: str):
+    return SQUARE_INDICES[square]
 
 
-def is_enemy(piece_1: str, piece_2: str):
-    if piece_1 is None or piece_2 is None:
-        return False
-    return piece_1.islower() != piece_2.islower()
+def index_to_square(index: int):
+    return SQUARE_NAMES[index]
 
 
-def is_same_rank(position_1: int, position_2: int):
-    return position_1 // 8 == position_2 // 8
+def encode_move(start: int, end: int, promotion: str | None = None) -> int:
+    # Pack a move into its 16-bit integer form
+    return start | (end << 6) | (PROMOTION_CODES[promotion] << PROMOTION_SHIFT)
 
 
-def square_to_index(square: str):
-    col = ord(square[0]) - ord('a')
-    row = int(square[1])
-    return (8 - row) * 8 + col
+def decode_move(move: int):
+    # (start, end, promotion piece or None), for code that works with the parts of a move
+    return move & 63, (move >> 6) & 63, PROMOTION_PIECES[move >> PROMOTION_SHIFT]
 
 
-def index_to_square(index: int):
-    row = 8 - (index // 8)
-    col = index % 8
-    return chr(ord('a') + col) + str(row)
+def move_to_uci(move: int):
+    # Convert a move to UCI (including promotion)
+    uci = UCI_SQUARE_PAIRS[move & MOVE_SQUARES_MASK]
+    if move >> PROMOTION_SHIFT:
+        uci += PROMOTION_PIECES[move >> PROMOTION_SHIFT]
+    return uci
 
 
-def move_to_uci(move):
-    # Convert start and end indices to UCI (including promotion)
-    start, end, promotion = move
-    uci = index_to_square(start) + index_to_square(end)
-    if promotion is not None:
-        uci += promotion
-    return uci
+def uci_to_move(state: BoardState, uci: str):
+    # The legal move in this position matching a UCI string, or None
+    try:
+        move = encode_move(SQUARE_INDICES[uci[:2]], SQUARE_INDICES[uci[2:4]], uci[4:] or None)
+    except KeyError:
+        return None
+    return move if move in state.get_all_valid_moves() else None
+
+
+def move_to_san(state: BoardState, move: int, legal_moves: list | None = None) -> str:
+    # Standard algebraic notation for a legal move (e.g. "Nbd7", "exd6", "e8=Q+", "O-O#")
+    if legal_moves is None:
+        legal_moves = state.get_all_valid_moves()
+    start = move & 63
+    end = (move >> 6) & 63
+    piece = state.board[start].upper()
+    if piece == "K" and abs(end - start) == 2:
+        san = "O-O" if end > start else "O-O-O"
+    elif piece == "P":
+        san = SQUARE_NAMES[start][0] + "x" if is_capture(state, move) else ""
+        san += SQUARE_NAMES[end]
+        if move >> PROMOTION_SHIFT:
+            san += "=" + PROMOTION_PIECES[move >> PROMOTION_SHIFT].upper()
+    else:
+        # Name the start file, rank or square when another piece of the same kind can reach the same square
+        rivals = [other & 63 for other in legal_moves if (other >> 6) & 63 == end and other & 63 != start
+                  and state.board[other & 63] == state.board[start]]
+        disambiguation = ""
+        if rivals:
+            if all(rival % 8 != start % 8 for rival in rivals):
+                disambiguation = SQUARE_NAMES[start][0]
+            elif all(rival // 8 != start // 8 for rival in rivals):
+                disambiguation = SQUARE_NAMES[start][1]
+            else:
+                disambiguation = SQUARE_NAMES[start]
+        san = piece + disambiguation + ("x" if state.board[end] is not None else "") + SQUARE_NAMES[end]
+
+    undo = state.make_move(move)
+    if state.is_in_check():
+        san += "+" if has_legal_move(state) else "#"
+    state.unmake_move(move, undo)
+    return san
+
+
+def san_to_move(state: BoardState, san: str):
+    # The legal move in this position matching a SAN string, or None (check marks, annotations and
+    # "0-0" style castling are accepted)
+    wanted = san.rstrip("+#!?").replace("0", "O")
+    legal_moves = state.get_all_valid_moves()
+    for move in legal_moves:
+        if move_to_san(state, move, legal_moves).rstrip("+#") == wanted:
+            return move
+    return None
 
 
 if __name__ == '__main__':
     # Testing code
-    test_fen = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
-
-    test_board = BoardState(test_fen)
+    test_board = BoardState.from_fen(START_FEN)
     moves = test_board.get_all_valid_moves()
-    print(len(moves), "moves -", moves)
+    print(len(moves), "moves -", " ".join(move_to_uci(move) for move in moves))
@@ -0,0 +1,60 @@
+# Long-lived engine state for a whole game: the board follows the game's move history instead of being
+# rebuilt from the FEN every turn, and the search context (transposition table, history, PV) carries over.
+from games.chess.Game3_chess_tools import BoardState, SearchContext, uci_to_move
+from games.chess.Game3_time_manager import TimeManager
+from games.chess.game import Game
+
+
+class LocalGame:
+    # Just the parts of the Joueur Game the Engine reads, for running it without a server (matches, UCI):
+    # the starting FEN and the moves played since (in UCI)
+    def __init__(self, fen: str):
+        self.fen = fen
+        self.history = []
+
+
+class Engine:
+    # Searches for whichever side is to move. The transposition table stores scores for the side to move at each
+    # position, so one engine analysing both colours (as a UCI GUI does) keeps everything it has searched.
+    def __init__(self, game: Game, tt_size_mb: float = 16, parallel=None):
+        self.context = SearchContext(tt_size_mb)
+        self.parallel = parallel
+        self.state = None
+        self.history_length = 0
+        self.reset(game)
+
+    def reset(self, game: Game):
+        # Start over from the game's FEN (first turn, or if the history ever stops making sense)
+        self.state = BoardState(game)
+        self.history_length = len(game.history)
+
+    def sync(self, game: Game) -> BoardState:
+        # Play the moves made since the last call (game.history is in UCI) and return the current position
+        previous_hash = self.state.hash
+        played = []
+        for uci in game.history[self.history_length:]:
+            move = uci_to_move(self.state, uci)
+            if move is None:
+                # Out of sync with the server: rebuild rather than search the wrong position
+                self.reset(game)
+                played = None
+                break
+            self.state.make_move(move)
+            played.append(move)
+        self.history_length = len(game.history)
+        self.state.is_white_player = self.state.white_to_move
+
+        # Keep the PV if it's already for this position (pondering hit), or drop the moves that were played off
+        # its front if the game followed it; otherwise it's useless
+        context = self.context
+        if context.pv_hash != self.state.hash:
+            if played is not None and context.pv_hash == previous_hash and context.pv[:len(played)] == played:
+                context.pv = context.pv[len(played):]
+                context.pv_hash = self.state.hash
+            else:
+                context.pv = []
+                context.pv_hash = None
+        return self.state
+
+    def get_best_move(self, time_manager: TimeManager | None = None):
+        return self.state.get_best_move(self.context, time_manager, self.parallel)
@@ -0,0 +1,214 @@
+# EPD test suites: search every position of an EPD file (with "bm" best-move and/or "am" avoid-move operations)
+# on a process pool, and report which were solved and how long the search took to settle on a solution.
+# The regression benchmark for search-efficiency changes: same limits, more solved or solved sooner.
+# Run from the Joueur.py directory, e.g.:
+#   python -m games.chess.Game3_epd                            (small built-in suite, 5s per position)
+#   python -m games.chess.Game3_epd wac.epd --time 2 --workers 8
+#   python -m games.chess.Game3_epd wac.epd --depth 6   or   --nodes 200000
+import argparse
+import multiprocessing
+import random
+import sys
+import time
+
+from games.chess.Game3_chess_tools import BoardState, SearchContext, move_to_san, move_to_uci, san_to_move
+from games.chess.Game3_tablebases import load_tablebases
+from games.chess.Game3_time_manager import SearchLimits
+
+# A few positions to check the runner with (the first Win At Chess positions, and two mates in one)
+DEFAULT_SUITE = [
+    '2rr3k/pp3pp1/1nnqbN1p/3pN3/2pP4/2P3Q1/PPB4P/R4RK1 w - - bm Qg6; id "WAC.001";',
+    '8/7p/5k2/5p2/p1p2P2/Pr1pPK2/1P1R3P/8 b - - bm Rxb2; id "WAC.002";',
+    '5rk1/1ppb3p/p1pb4/6q1/3P1p1r/2P1R2P/PP1BQ1P1/5RKN w - - bm Rg3; id "WAC.003";',
+    'r1bq2rk/pp3pbp/2p1p1pQ/7P/3P4/2PB1N2/PP3PPR/2KR4 w - - bm Qxh7+; id "WAC.004";',
+    '5k2/6pp/p1qN4/1p1p4/3P4/2PKP2Q/PP3r2/3R4 b - - bm Qc4+; id "WAC.005";',
+    'r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - bm Qxf7#; id "scholar";',
+    '7k/5Q2/6K1/8/8/8/8/8 w - - bm Qe8# Qf8# Qg7# Qh7#; id "queen mate";',
+]
+
+# Seconds per position when no limit is given
+DEFAULT_MOVE_TIME = 5.0
+
+
+class EpdPosition:
+    # One EPD record: the position, the moves that solve it (bm) and the moves that fail it (am), both in UCI
+    def __init__(self, fen: str, operations: dict, best_moves: list, avoid_moves: list):
+        self.fen = fen
+        self.operations = operations
+        self.best_moves = best_moves
+        self.avoid_moves = avoid_moves
+
+    @property
+    def name(self) -> str:
+        return self.operations.get("id", [self.fen])[0]
+
+    def is_solution(self, uci: str | None) -> bool:
+        if uci is None:
+            return False
+        if self.best_moves and uci not in self.best_moves:
+            return False
+        return uci not in self.avoid_moves
+
+
+# ========== PARSING ==========
+
+def parse_operations(text: str) -> dict:
+    # 'bm Qg6; id "WAC.001";' -> {"bm": ["Qg6"], "id": ["WAC.001"]} (quoted operands may contain spaces)
+    operations = {}
+    for operation in text.split(";"):
+        operation = operation.strip()
+        if not operation:
+            continue
+        opcode, _, operands = operation.partition(" ")
+        operands = operands.strip()
+        if operands.startswith('"'):
+            operations[opcode] = [operands.strip('"')]
+        else:
+            operations[opcode] = operands.split()
+    return operations
+
+
+def parse_epd(line: str) -> EpdPosition:
+    # The four position fields, then operations; the move counters come from hmvc/fmvn when given
+    fields = line.split(maxsplit=4)
+    if len(fields) < 4:
+        raise ValueError(f"Not an EPD record: {line}")
+    operations = parse_operations(fields[4] if len(fields) > 4 else "")
+    halfmove_clock = operations.get("hmvc", ["0"])[0]
+    fullmove_number = operations.get("fmvn", ["1"])[0]
+    fen = " ".join(fields[:4] + [halfmove_clock, fullmove_number])
+
+    # bm/am are in SAN, converted once here so the workers only compare UCI strings
+    state = BoardState.from_fen(fen)
+    moves = {}
+    for opcode in ("bm", "am"):
+        moves[opcode] = []
+        for san in operations.get(opcode, []):
+            move = san_to_move(state, san)
+            if move is None:
+                raise ValueError(f"Illegal {opcode} move {san} in: {line}")
+            moves[opcode].append(move_to_uci(move))
+    return EpdPosition(fen, operations, moves["bm"], moves["am"])
+
+
+def load_epd(path: str) -> list:
+    # Every record of an EPD file (blank lines and # comments skipped)
+    with open(path) as epd_file:
+        return [parse_epd(line) for line in epd_file if line.strip() and not line.startswith("#")]
+
+
+# ========== ANALYSIS ==========
+
+def analyse_position(job) -> dict:
+    # Search one position and report what it played, whether that solves it, and when the search first settled
+    # on a solution for good (the time and nodes up to the end of that iteration)
+    index, position, depth, nodes, move_time, tt_size_mb = job
+    state = BoardState.from_fen(position.fen)
+    context = SearchContext(tt_size_mb)
+    # Repeatable tie-breaks between equally scored root moves
+    random.seed(state.hash)
+    start = time.perf_counter()
+    move = state.get_best_move(context, SearchLimits(context, depth, nodes, move_time))
+    seconds = time.perf_counter() - start
+
+    solved_at = None
+    elapsed = 0.0
+    searched = 0
+    for stats in context.stats.depths:
+        elapsed += stats.seconds
+        searched += stats.nodes
+        if not stats.completed:
+            continue
+        if position.is_solution(stats.best_move):
+            if solved_at is None:
+                solved_at = (stats.depth, elapsed, searched)
+        else:
+            solved_at = None
+    uci = move_to_uci(move) if move is not None else None
+    return {
+        "index": index,
+        "name": position.name,
+        "move": move_to_san(state, move) if move is not None else None,
+        "solved": position.is_solution(uci),
+        "depth": context.stats.completed_depth,
+        "nodes": context.stats.nodes,
+        "time": seconds,
+        "solved_at": solved_at,
+    }
+
+
+def analyse_positions(positions: list, depth: int | None = None, nodes: int | None = None,
+                      move_time: float | None = None, workers: int | None = None, tt_size_mb: float = 16,
+                      on_result=None) -> list:
+    # Search every position on a process pool (each with a fresh context, so results don't depend on the order).
+    # Returns the result dicts in suite order; on_result(result) is called as each one finishes.
+    jobs = [(index, position, depth, nodes, move_time, tt_size_mb) for index, position in enumerate(positions)]
+    results = [None] * len(jobs)
+    with multiprocessing.Pool(workers or multiprocessing.cpu_count(), load_tablebases) as pool:
+        for result in pool.imap_unordered(analyse_position, jobs):
+            results[result["index"]] = result
+            if on_result is not None:
+                on_result(result)
+    return results
+
+
+# ========== COMMAND LINE ==========
+
+def format_result(result: dict, position: EpdPosition) -> str:
+    expected = " ".join(position.operations.get("bm", []))
+    avoid = " ".join(position.operations.get("am", []))
+    target = (f"bm {expected}" if expected else "") + (f" am {avoid}" if avoid else "")
+    if result["solved_at"] is not None:
+        depth, seconds, nodes = result["solved_at"]
+        found = f"found at depth {depth}, {seconds:.2f}s, {nodes:,} nodes"
+    else:
+        found = "not found"
+    return (f"{'ok  ' if result['solved'] else 'FAIL'} {result['name']:<12} {result['move'] or '-':<8} "
+            f"({target.strip()}) depth {result['depth']}, {result['time']:.2f}s - {found}")
+
+
+def print_summary(results: list):
+    solved = [result for result in results if result["solved"]]
+    total_time = sum(result["time"] for result in results)
+    total_nodes = sum(result["nodes"] for result in results)
+    print(f"solved {len(solved)}/{len(results)} ({len(solved) / len(results):.1%}), "
+          f"{total_nodes:,} nodes in {total_time:.1f}s of search, "
+          f"{total_nodes / total_time if total_time > 0 else 0:,.0f} nps")
+    found = [result["solved_at"] for result in solved if result["solved_at"] is not None]
+    if found:
+        print(f"time to solution: {sum(seconds for _, seconds, _ in found):.2f}s total, "
+              f"average depth {sum(depth for depth, _, _ in found) / len(found):.2f}, "
+              f"{sum(nodes for _, _, nodes in found):,} nodes total")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run an EPD test suite through the search")
+    parser.add_argument("path", nargs="?", help="EPD file (default: a small built-in suite)")
+    parser.add_argument("--time", type=float, help=f"seconds per position (default {DEFAULT_MOVE_TIME:g} "
+                                                   "when no other limit is given)")
+    parser.add_argument("--depth", type=int, help="search each position to this depth")
+    parser.add_argument("--nodes", type=int, help="stop each search after about this many nodes")
+    parser.add_argument("--workers", type=int, help="positions searched at once (default: one per CPU)")
+    parser.add_argument("--hash", type=float, default=16, help="transposition table size per search (MB)")
+    args = parser.parse_args(argv)
+
+    try:
+        positions = load_epd(args.path) if args.path else [parse_epd(line) for line in DEFAULT_SUITE]
+    except ValueError as error:
+        parser.error(str(error))
+    if not positions:
+        parser.error("no positions to search")
+    move_time = args.time
+    if move_time is None and args.depth is None and args.nodes is None:
+        move_time = DEFAULT_MOVE_TIME
+
+    start = time.perf_counter()
+    results = analyse_positions(positions, args.depth, args.nodes, move_time, args.workers, args.hash,
+                                lambda result: print(format_result(result, positions[result["index"]])))
+    print_summary(results)
+    print(f"{len(positions)} positions in {time.perf_counter() - start:.1f}s")
+    return 0 if all(result["solved"] for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,263 @@
+# Offline self-play matches: two engine configurations play each other from a list of opening positions,
+# with the games spread over worker processes, and the score, depth reached, speed and time per move reported.
+# No server needed, so search changes can be checked for strength and speed locally.
+# Run from the Joueur.py directory, e.g.:
+#   python -m games.chess.Game3_match --games 20 --time 30 --increment 0.2
+#   python -m games.chess.Game3_match --games 10 --depth 4 --b "plain:null_move=0,late_move_reductions=0"
+#   python -m games.chess.Game3_match --openings openings.txt --workers 8   (one FEN per line)
+import argparse
+import math
+import multiprocessing
+import sys
+import time
+
+from games.chess.Game3_chess_tools import BoardState, move_to_uci
+from games.chess.Game3_engine import Engine, LocalGame
+from games.chess.Game3_tablebases import load_tablebases
+from games.chess.Game3_time_manager import SearchLimits, TimeManager
+
+# Positions after the main line of some common openings (white to move, move 5 or 6)
+OPENING_FENS = [
+    ("Ruy Lopez", "r1bqkb1r/1ppp1ppp/p1n2n2/4p3/B3P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 2 5"),
+    ("Italian", "r1bqk2r/pppp1ppp/2n2n2/2b1p3/2B1P3/2P2N2/PP1P1PPP/RNBQK2R w KQkq - 1 5"),
+    ("Sicilian Najdorf", "rnbqkb1r/1p2pppp/p2p1n2/8/3NP3/2N5/PPP2PPP/R1BQKB1R w KQkq - 0 6"),
+    ("French", "rnbqk2r/ppp1bppp/4pn2/3p2B1/3PP3/2N5/PPP2PPP/R2QKBNR w KQkq - 4 5"),
+    ("Caro-Kann", "rn1qkbnr/pp2pppp/2p5/5b2/3PN3/8/PPP2PPP/R1BQKBNR w KQkq - 1 5"),
+    ("Queen's Gambit Declined", "rnbqk2r/ppp1bppp/4pn2/3p2B1/2PP4/2N5/PP2PPPP/R2QKBNR w KQkq - 4 5"),
+    ("Slav", "rnbqkb1r/pp2pppp/2p2n2/8/2pP4/2N2N2/PP2PPPP/R1BQKB1R w KQkq - 0 5"),
+    ("King's Indian", "rnbqk2r/ppp1ppbp/3p1np1/8/2PPP3/2N5/PP3PPP/R1BQKBNR w KQkq - 0 5"),
+    ("English", "r1bqkb1r/ppp2ppp/2n2n2/3pp3/2P5/2N2NP1/PP1PPP1P/R1BQKB1R w KQkq d6 0 5"),
+    ("Scandinavian", "rnb1kb1r/ppp1pppp/5n2/q7/3P4/2N5/PPP2PPP/R1BQKBNR w KQkq - 1 5"),
+]
+
+# Games still going after this many plies are scored as draws
+MAX_GAME_PLIES = 300
+
+# Search switches a configuration can set (as name=0/1)
+SWITCH_OPTIONS = ("null_move", "late_move_reductions", "futility_pruning", "see_pruning")
+
+
+class EngineConfig:
+    # One side of a match: the search switches and how long it gets to think
+    def __init__(self, name: str, time_control: float = 60.0, increment: float = 0.0, depth: int | None = None,
+                 tt_size_mb: float = 16, null_move: bool = True, late_move_reductions: bool = True,
+                 futility_pruning: bool = True, see_pruning: bool = True):
+        self.name = name
+        # Seconds on the clock for the whole game (ignored when searching to a fixed depth)
+        self.time_control = time_control
+        self.increment = increment
+        self.depth = depth
+        self.tt_size_mb = tt_size_mb
+        self.null_move = null_move
+        self.late_move_reductions = late_move_reductions
+        self.futility_pruning = futility_pruning
+        self.see_pruning = see_pruning
+
+    @classmethod
+    def parse(cls, text: str, **defaults) -> 'EngineConfig':
+        # "name" or "name:option=value,...", e.g. "plain:null_move=0,futility_pruning=0,depth=4"
+        name, _, options = text.partition(":")
+        config = cls(name, **defaults)
+        for option in filter(None, options.split(",")):
+            key, _, value = option.partition("=")
+            if key in SWITCH_OPTIONS:
+                setattr(config, key, value not in ("0", "false", "off"))
+            elif key == "depth":
+                config.depth = int(value)
+            elif key in ("time_control", "increment", "tt_size_mb"):
+                setattr(config, key, float(value))
+            else:
+                raise ValueError(f"Unknown engine option {key!r}")
+        return config
+
+    def create_engine(self, game) -> Engine:
+        engine = Engine(game, self.tt_size_mb)
+        context = engine.context
+        context.null_move = self.null_move
+        context.late_move_reductions = self.late_move_reductions
+        context.futility_pruning = self.futility_pruning
+        context.see_pruning = self.see_pruning
+        return engine
+
+
+class SideStats:
+    # Search totals for one engine over one or more games
+    def __init__(self):
+        self.moves = 0
+        self.depth = 0
+        self.nodes = 0
+        self.seconds = 0.0
+
+    def add_search(self, stats, seconds: float):
+        self.moves += 1
+        self.depth += stats.completed_depth
+        self.nodes += stats.nodes
+        self.seconds += seconds
+
+    def merge(self, other: 'SideStats'):
+        self.moves += other.moves
+        self.depth += other.depth
+        self.nodes += other.nodes
+        self.seconds += other.seconds
+
+    def summary(self) -> str:
+        if not self.moves:
+            return "no moves"
+        nps = self.nodes / self.seconds if self.seconds > 0 else 0
+        return (f"depth {self.depth / self.moves:.2f}, {nps:,.0f} nps, "
+                f"{self.seconds / self.moves:.3f}s per move ({self.moves} moves)")
+
+
+# ========== PLAYING ==========
+
+def has_insufficient_material(state: BoardState) -> bool:
+    # Bare kings, or a king and a single knight or bishop against a bare king
+    pieces = state.occupied.bit_count()
+    if pieces == 2:
+        return True
+    bitboards = state.bitboards
+    minors = bitboards["N"] | bitboards["B"] | bitboards["n"] | bitboards["b"]
+    return pieces == 3 and minors != 0
+
+
+def play_game(job):
+    # Play one game, returning (game index, result from white's view, reason, plies, white stats, black stats)
+    index, fen, white, black, max_plies = job
+    game = LocalGame(fen)
+    configs = {True: white, False: black}
+    engines = {True: white.create_engine(game), False: black.create_engine(game)}
+    clocks = {True: white.time_control, False: black.time_control}
+    stats = {True: SideStats(), False: SideStats()}
+    referee = BoardState.from_fen(fen)
+    repetitions = {referee.hash: 1}
+
+    while True:
+        side = referee.white_to_move
+        if not referee.has_legal_move():
+            if referee.is_in_check():
+                return index, ("0-1" if side else "1-0"), "checkmate", len(game.history), stats[True], stats[False]
+            return index, "1/2-1/2", "stalemate", len(game.history), stats[True], stats[False]
+        if referee.halfmove_clock >= 100:
+            return index, "1/2-1/2", "50-move rule", len(game.history), stats[True], stats[False]
+        if repetitions[referee.hash] >= 3:
+            return index, "1/2-1/2", "repetition", len(game.history), stats[True], stats[False]
+        if has_insufficient_material(referee):
+            return index, "1/2-1/2", "insufficient material", len(game.history), stats[True], stats[False]
+        if len(game.history) >= max_plies:
+            return index, "1/2-1/2", "move limit", len(game.history), stats[True], stats[False]
+
+        config = configs[side]
+        engine = engines[side]
+        state = engine.sync(game)
+        if config.depth is not None:
+            limit = SearchLimits(engine.context, depth=config.depth)
+        else:
+            limit = TimeManager(clocks[side], config.increment, state.fullmove_number)
+        start = time.perf_counter()
+        move = engine.get_best_move(limit)
+        seconds = time.perf_counter() - start
+        stats[side].add_search(engine.context.stats, seconds)
+        if config.depth is None:
+            clocks[side] -= seconds
+            if clocks[side] <= 0:
+                return index, ("0-1" if side else "1-0"), "time forfeit", len(game.history), stats[True], stats[False]
+            clocks[side] += config.increment
+
+        game.history.append(move_to_uci(move))
+        referee.make_move(move)
+        repetitions[referee.hash] = repetitions.get(referee.hash, 0) + 1
+
+
+# ========== MATCHES ==========
+
+def create_jobs(engine_a: EngineConfig, engine_b: EngineConfig, games: int, openings: list,
+                max_plies: int = MAX_GAME_PLIES) -> list:
+    # Each opening is played twice in a row with the colors swapped, so neither side gets the better openings
+    jobs = []
+    for index in range(games):
+        fen = openings[(index // 2) % len(openings)]
+        white, black = (engine_a, engine_b) if index % 2 == 0 else (engine_b, engine_a)
+        jobs.append((index, fen, white, black, max_plies))
+    return jobs
+
+
+def elo_difference(score: float) -> float | None:
+    # Rating difference implied by a score fraction (None at 0% or 100%)
+    if score <= 0 or score >= 1:
+        return None
+    return 400 * math.log10(score / (1 - score))
+
+
+def run_match(engine_a: EngineConfig, engine_b: EngineConfig, games: int, openings: list,
+              workers: int | None = None, max_plies: int = MAX_GAME_PLIES) -> dict:
+    # Play the games on a process pool, printing each result as it finishes. Returns the totals:
+    # wins/draws/losses and score from engine_a's view, and the search stats of each engine.
+    jobs = create_jobs(engine_a, engine_b, games, openings, max_plies)
+    results = {"wins": 0, "draws": 0, "losses": 0}
+    side_stats = {engine_a.name: SideStats(), engine_b.name: SideStats()}
+    with multiprocessing.Pool(workers or multiprocessing.cpu_count(), load_tablebases) as pool:
+        for index, result, reason, plies, white_stats, black_stats in pool.imap_unordered(play_game, jobs):
+            _, _, white, black, _ = jobs[index]
+            side_stats[white.name].merge(white_stats)
+            side_stats[black.name].merge(black_stats)
+            if result == "1/2-1/2":
+                results["draws"] += 1
+            elif (result == "1-0") == (white is engine_a):
+                results["wins"] += 1
+            else:
+                results["losses"] += 1
+            print(f"game {index + 1:>3}: {white.name} - {black.name} {result} ({reason}, {plies} plies)")
+
+    played = results["wins"] + results["draws"] + results["losses"]
+    results["score"] = (results["wins"] + results["draws"] / 2) / played if played else 0.0
+    results["stats"] = side_stats
+    return results
+
+
+def print_report(engine_a: EngineConfig, engine_b: EngineConfig, results: dict):
+    score = results["score"]
+    elo = elo_difference(score)
+    print(f"{engine_a.name} vs {engine_b.name}: +{results['wins']} ={results['draws']} -{results['losses']} "
+          f"({score:.1%}, Elo {'-' if elo is None else f'{elo:+.0f}'})")
+    for name, stats in results["stats"].items():
+        print(f"  {name}: {stats.summary()}")
+
+
+def load_openings(path: str) -> list:
+    # One FEN per line (blank lines and # comments skipped)
+    with open(path) as openings_file:
+        return [line.strip() for line in openings_file if line.strip() and not line.startswith("#")]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Play engine configurations against each other locally")
+    parser.add_argument("--a", default="A", help='first engine, as "name" or "name:option=value,..."')
+    parser.add_argument("--b", default="B", help="second engine (same format)")
+    parser.add_argument("--games", type=int, default=len(OPENING_FENS) * 2, help="number of games")
+    parser.add_argument("--time", type=float, default=60.0, help="seconds per side per game")
+    parser.add_argument("--increment", type=float, default=0.0, help="seconds added after every move")
+    parser.add_argument("--depth", type=int, help="search to a fixed depth instead of using the clock")
+    parser.add_argument("--openings", help="file of opening FENs (default: the built-in list)")
+    parser.add_argument("--workers", type=int, help="games played at once (default: one per CPU)")
+    parser.add_argument("--max-plies", type=int, default=MAX_GAME_PLIES, help="adjudicate as a draw after this")
+    args = parser.parse_args(argv)
+
+    defaults = {"time_control": args.time, "increment": args.increment, "depth": args.depth}
+    try:
+        engine_a = EngineConfig.parse(args.a, **defaults)
+        engine_b = EngineConfig.parse(args.b, **defaults)
+    except ValueError as error:
+        parser.error(str(error))
+    if engine_a.name == engine_b.name:
+        parser.error("the two engines need different names")
+    openings = load_openings(args.openings) if args.openings else [fen for _, fen in OPENING_FENS]
+
+    start = time.perf_counter()
+    results = run_match(engine_a, engine_b, args.games, openings, args.workers, args.max_plies)
+    print_report(engine_a, engine_b, results)
+    print(f"{args.games} games in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,174 @@
+# Opening book: a sorted binary file of (position key, move, weight) entries, memory-mapped and binary searched.
+# The layout is Polyglot's (16-byte big-endian entries: key, move, weight, learn; castling stored as king takes
+# rook), but the keys are this engine's own Zobrist hashes, so real Polyglot .bin books won't match.
+# Build the default book with:  python -m games.chess.Game3_opening_book [path]
+import mmap
+import os
+import random
+import struct
+import sys
+
+from games.chess.Game3_chess_tools import START_FEN, BoardState, decode_move, encode_move, uci_to_move
+
+# key (8) + move (2) + weight (2) + learn (4)
+BOOK_ENTRY = struct.Struct(">QHHI")
+BOOK_KEY = struct.Struct(">Q")
+
+DEFAULT_BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Game3_opening_book.bin")
+
+# Main lines the default book is built from (every position along a line gets that line's next move)
+BOOK_LINES = [
+    # Ruy Lopez, Italian, Scotch, Petroff
+    "e2e4 e7e5 g1f3 b8c6 f1b5 a7a6 b5a4 g8f6 e1g1 f8e7 f1e1 b7b5 a4b3 d7d6 c2c3 e8g8",
+    "e2e4 e7e5 g1f3 b8c6 f1b5 g8f6 e1g1 f6e4 d2d4 e4d6 b5c6 d7c6 d4e5 d6f5",
+    "e2e4 e7e5 g1f3 b8c6 f1c4 f8c5 c2c3 g8f6 d2d3 d7d6 e1g1 e8g8",
+    "e2e4 e7e5 g1f3 b8c6 f1c4 g8f6 d2d3 f8e7 e1g1 e8g8",
+    "e2e4 e7e5 g1f3 b8c6 d2d4 e5d4 f3d4 g8f6 d4c6 b7c6 e4e5 d8e7",
+    "e2e4 e7e5 g1f3 g8f6 f3e5 d7d6 e5f3 f6e4 d2d4 d6d5 f1d3",
+    # Sicilian
+    "e2e4 c7c5 g1f3 d7d6 d2d4 c5d4 f3d4 g8f6 b1c3 a7a6 c1e3 e7e5 d4b3",
+    "e2e4 c7c5 g1f3 b8c6 d2d4 c5d4 f3d4 g8f6 b1c3 e7e5 d4b5 d7d6",
+    "e2e4 c7c5 g1f3 e7e6 d2d4 c5d4 f3d4 b8c6 b1c3 d8c7",
+    # French, Caro-Kann, Scandinavian
+    "e2e4 e7e6 d2d4 d7d5 b1c3 g8f6 c1g5 f8e7 e4e5 f6d7 g5e7 d8e7",
+    "e2e4 e7e6 d2d4 d7d5 b1d2 c7c5 e4d5 e6d5 g1f3 b8c6",
+    "e2e4 c7c6 d2d4 d7d5 b1c3 d5e4 c3e4 c8f5 e4g3 f5g6 h2h4 h7h6",
+    "e2e4 c7c6 d2d4 d7d5 e4e5 c8f5 g1f3 e7e6 f1e2",
+    "e2e4 d7d5 e4d5 d8d5 b1c3 d5a5 d2d4 g8f6 g1f3 c8f5",
+    # Queen's Gambit, Slav
+    "d2d4 d7d5 c2c4 e7e6 b1c3 g8f6 c1g5 f8e7 e2e3 e8g8 g1f3 h7h6",
+    "d2d4 d7d5 c2c4 d5c4 g1f3 g8f6 e2e3 e7e6 f1c4 c7c5 e1g1 a7a6",
+    "d2d4 d7d5 c2c4 c7c6 g1f3 g8f6 b1c3 d5c4 a2a4 c8f5 e2e3 e7e6",
+    # Indian defences
+    "d2d4 g8f6 c2c4 e7e6 b1c3 f8b4 e2e3 e8g8 f1d3 d7d5 g1f3 c7c5",
+    "d2d4 g8f6 c2c4 e7e6 g1f3 b7b6 g2g3 c8a6 b2b3 f8b4 c1d2 b4e7",
+    "d2d4 g8f6 c2c4 g7g6 b1c3 f8g7 e2e4 d7d6 g1f3 e8g8 f1e2 e7e5 e1g1 b8c6",
+    "d2d4 g8f6 c2c4 g7g6 b1c3 d7d5 c4d5 f6d5 e2e4 d5c3 b2c3 f8g7",
+    "d2d4 g8f6 g1f3 e7e6 c1f4 c7c5 e2e3 b8c6",
+    # Flank openings
+    "c2c4 e7e5 b1c3 g8f6 g1f3 b8c6 g2g3 d7d5 c4d5 f6d5 f1g2 d5b6",
+    "c2c4 c7c5 g1f3 g8f6 b1c3 b8c6 g2g3 g7g6 f1g2 f8g7",
+    "g1f3 d7d5 g2g3 g8f6 f1g2 e7e6 e1g1 f8e7 d2d3 e8g8",
+]
+
+# Polyglot promotion codes
+BOOK_PROMOTIONS = {None: 0, "n": 1, "b": 2, "r": 3, "q": 4}
+BOOK_PROMOTION_PIECES = {code: piece for piece, code in BOOK_PROMOTIONS.items()}
+
+# Castling is stored as the king capturing its own rook (e1g1 <-> e1h1 and so on)
+CASTLING_TO_BOOK = {(60, 62): (60, 63), (60, 58): (60, 56), (4, 6): (4, 7), (4, 2): (4, 0)}
+CASTLING_FROM_BOOK = {book: move for move, book in CASTLING_TO_BOOK.items()}
+
+
+# ========== MOVE ENCODING ==========
+
+def encode_book_move(state: BoardState, move: int) -> int:
+    # Polyglot bits: to file (0-2), to rank (3-5), from file (6-8), from rank (9-11), promotion (12-14),
+    # where ranks count up from white's back rank (our rows count down from it)
+    start, end, promotion = decode_move(move)
+    if state.board[start] in ("K", "k"):
+        start, end = CASTLING_TO_BOOK.get((start, end), (start, end))
+    return ((end % 8) | ((7 - end // 8) << 3) | ((start % 8) << 6) | ((7 - start // 8) << 9)
+            | (BOOK_PROMOTIONS[promotion] << 12))
+
+
+def decode_book_move(state: BoardState, code: int):
+    end = (7 - ((code >> 3) & 7)) * 8 + (code & 7)
+    start = (7 - ((code >> 9) & 7)) * 8 + ((code >> 6) & 7)
+    if state.board[start] in ("K", "k"):
+        start, end = CASTLING_FROM_BOOK.get((start, end), (start, end))
+    return encode_move(start, end, BOOK_PROMOTION_PIECES.get((code >> 12) & 7))
+
+
+# ========== LOOKUP ==========
+
+class OpeningBook:
+    def __init__(self, path: str = DEFAULT_BOOK_PATH):
+        self.path = path
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        # mmap can't map an empty file
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.size = size // BOOK_ENTRY.size
+
+    def _first_index(self, key: int) -> int:
+        # Binary search for the first entry with this key (or the insertion point)
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if BOOK_KEY.unpack_from(self.data, middle * BOOK_ENTRY.size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def entries(self, key: int) -> list:
+        # Every (move code, weight) stored for a position key
+        results = []
+        index = self._first_index(key)
+        while index < self.size:
+            entry_key, move, weight, _ = BOOK_ENTRY.unpack_from(self.data, index * BOOK_ENTRY.size)
+            if entry_key != key:
+                break
+            results.append((move, weight))
+            index += 1
+        return results
+
+    def get_moves(self, state: BoardState) -> list:
+        # Book moves for this position as (move, weight), dropping any that aren't legal (hash collisions)
+        candidates = self.entries(state.hash)
+        if not candidates:
+            return []
+        legal_moves = state.get_all_valid_moves()
+        results = []
+        for code, weight in candidates:
+            move = decode_book_move(state, code)
+            if move in legal_moves and weight > 0:
+                results.append((move, weight))
+        return results
+
+    def choose_move(self, state: BoardState, rng=random):
+        # Weighted random book move, or None once out of book
+        moves = self.get_moves(state)
+        if not moves:
+            return None
+        return rng.choices([move for move, _ in moves], weights=[weight for _, weight in moves])[0]
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+
+# ========== BUILDING ==========
+
+def build_book(lines: list, path: str, start_fen: str = START_FEN) -> int:
+    # Play through each line of UCI moves, counting how often every (position, move) pair shows up,
+    # then write the sorted entries (the count is the weight). Returns the number of entries.
+    counts = {}
+    for line in lines:
+        state = BoardState.from_fen(start_fen)
+        for uci in line.split():
+            move = uci_to_move(state, uci)
+            if move is None:
+                raise ValueError(f"Illegal book move {uci} in line: {line}")
+            entry = (state.hash, encode_book_move(state, move))
+            counts[entry] = counts.get(entry, 0) + 1
+            state.make_move(move)
+
+    with open(path, "wb") as book_file:
+        for (key, move), count in sorted(counts.items()):
+            book_file.write(BOOK_ENTRY.pack(key, move, min(count, 0xFFFF), 0))
+    return len(counts)
+
+
+def load_default_book() -> OpeningBook:
+    # The default book, built from BOOK_LINES the first time it is needed
+    if not os.path.exists(DEFAULT_BOOK_PATH):
+        build_book(BOOK_LINES, DEFAULT_BOOK_PATH)
+    return OpeningBook(DEFAULT_BOOK_PATH)
+
+
+if __name__ == '__main__':
+    output_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_BOOK_PATH
+    print(build_book(BOOK_LINES, output_path), "entries written to", output_path)
@@ -0,0 +1,137 @@
+# Parallel root search: the root moves of an iterative-deepening iteration are split across a pool of
+# worker processes. The workers share the best root score found so far, so each root move starts with
+# the tightest alpha bound known at that moment.
+import math
+import multiprocessing
+import time
+
+from games.chess.Game3_chess_tools import (
+    MATE_SCORE, BoardState, SearchContext, extract_pv, score_root_move, search_root_moves
+)
+from games.chess.Game3_tablebases import load_tablebases
+
+# Shallow iterations finish faster on one process than it takes to hand them out
+MIN_SPLIT_DEPTH = 3
+# Every worker keeps its own transposition table between root moves and turns
+WORKER_TT_SIZE_MB = 16
+
+# Value of the shared bound before any root move has been scored (below every real score)
+NO_SCORE = -MATE_SCORE - 1
+
+
+# ========== WORKER PROCESSES ==========
+
+# Set once per worker process by init_worker
+_worker_context = None
+_worker_root_hash = None
+_shared_best_score = None
+
+
+def init_worker(shared_best_score, tt_size_mb: float):
+    global _worker_context, _shared_best_score
+    _worker_context = SearchContext(tt_size_mb)
+    _shared_best_score = shared_best_score
+    # Already loaded when the pool was forked, but spawned workers start empty
+    load_tablebases()
+
+
+def best_line_entries(state: BoardState, move, depth: int, context: SearchContext) -> list:
+    # The transposition table entries along the line found under a root move, as (key, depth, score, bound, move),
+    # so the main process can store them and rebuild the same PV from its own table
+    undo = state.make_move(move)
+    entries = []
+    undos = []
+    for reply in extract_pv(state, context, depth - 1):
+        entries.append((state.hash, *context.tt.probe(state.hash)))
+        undos.append((reply, state.make_move(reply)))
+    for reply, reply_undo in reversed(undos):
+        state.unmake_move(reply, reply_undo)
+    state.unmake_move(move, undo)
+    return entries
+
+
+def search_root_move(job):
+    # Score one root move, returning (move, score, counters, stopped, line) where counters are the statistics
+    # counters (nodes, leaf evaluations, cutoffs, first-move cutoffs) for this move and line is its
+    # best_line_entries. The score is None when the move was skipped because another one already failed high.
+    global _worker_root_hash
+    state, move, depth, deadline, alpha, beta, selectivity = job
+    context = _worker_context
+    if state.hash != _worker_root_hash:
+        # First job of a new turn (killers from the last position would only be noise)
+        context.new_search()
+        _worker_root_hash = state.hash
+    context.nodes = context.leaf_evals = context.cutoffs = context.first_move_cutoffs = 0
+    context.stopped = False
+    context.follow_pv = False
+    context.null_move, context.late_move_reductions, context.futility_pruning, context.see_pruning = selectivity
+    # perf_counter() is a system-wide clock, so the parent's deadline is valid here too
+    context.deadline = deadline
+    if deadline is not None and time.perf_counter() >= deadline:
+        return move, None, (0, 0, 0, 0), True, []
+
+    best_score = _shared_best_score.value
+    if best_score != NO_SCORE:
+        alpha = max(alpha, best_score - 1)
+    if alpha + 1 >= beta:
+        return move, None, (0, 0, 0, 0), False, []
+    score = score_root_move(state, move, depth, context, alpha, beta)
+    if not context.stopped:
+        # Raise the shared bound for the moves that start after this one
+        with _shared_best_score.get_lock():
+            if score > _shared_best_score.value:
+                _shared_best_score.value = score
+    counters = (context.nodes, context.leaf_evals, context.cutoffs, context.first_move_cutoffs)
+    line = [] if context.stopped else best_line_entries(state, move, depth, context)
+    return move, score, counters, context.stopped, line
+
+
+# ========== ROOT SPLITTING ==========
+
+class ParallelSearch:
+    # A pool of search processes kept alive for the whole game (starting processes every move is too slow)
+    def __init__(self, workers: int | None = None, tt_size_mb: float = WORKER_TT_SIZE_MB):
+        self.workers = workers or multiprocessing.cpu_count()
+        self.best_score = multiprocessing.Value("i", NO_SCORE)
+        self.pool = multiprocessing.Pool(self.workers, init_worker, (self.best_score, tt_size_mb))
+
+    def should_split(self, depth: int, num_moves: int) -> bool:
+        return depth >= MIN_SPLIT_DEPTH and num_moves > 1
+
+    def search_root_moves(self, state: BoardState, moves: list, depth: int, context: SearchContext,
+                          alpha: float = -math.inf, beta: float = math.inf):
+        # Same result as the serial search_root_moves: (best score, every move with that score)
+        # The first (PV) move is searched here first, so the workers start with a real bound
+        best_score, best_moves = search_root_moves(state, moves[:1], depth, context, alpha, beta)
+        if context.stopped or best_score >= beta:
+            return best_score, best_moves
+        self.best_score.value = best_score
+
+        # Later moves can be scored against a higher bound than earlier ones, but a move that fails low
+        # always scores below the final best, so ties for the random choice are still exact
+        jobs = [(state, move, depth, context.deadline, alpha, beta, context.selectivity()) for move in moves[1:]]
+        for move, score, counters, stopped, line in self.pool.imap_unordered(search_root_move, jobs):
+            nodes, leaf_evals, cutoffs, first_move_cutoffs = counters
+            context.nodes += nodes
+            context.leaf_evals += leaf_evals
+            context.cutoffs += cutoffs
+            context.first_move_cutoffs += first_move_cutoffs
+            if stopped:
+                context.stopped = True
+            elif score is None:
+                continue
+            elif score > best_score:
+                best_score = score
+                best_moves = [move]
+            elif score == best_score:
+                best_moves.append(move)
+            if score is not None and score >= best_score:
+                # The line under a new best move was only in the worker's table: copy it over, so the PV
+                # (and the PV-first ordering of the next iteration) follows it past the root
+                for key, entry_depth, entry_score, bound, reply in line:
+                    context.tt.store(key, entry_depth, entry_score, bound, reply)
+        return best_score, best_moves
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
@@ -0,0 +1,115 @@
+# Perft (move path enumeration) for checking and timing the move generator.
+# Run from the Joueur.py directory, e.g.:
+#   python -m games.chess.Game3_perft                      (reference suite up to depth 3)
+#   python -m games.chess.Game3_perft --suite --depth 4
+#   python -m games.chess.Game3_perft --fen "<fen>" --depth 3 --divide
+import argparse
+import sys
+import time
+
+from games.chess.Game3_chess_tools import START_FEN, BoardState, move_to_uci
+
+# Standard reference positions with their known node counts for depth 1, 2, 3, ...
+# (from the Chess Programming Wiki "Perft Results" page)
+PERFT_POSITIONS = [
+    ("startpos", START_FEN, [20, 400, 8902, 197281, 4865609]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     [48, 2039, 97862, 4085603]),
+    ("position 3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", [14, 191, 2812, 43238, 674624]),
+    ("position 4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", [6, 264, 9467, 422333]),
+    ("position 5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", [44, 1486, 62379, 2103487]),
+    ("position 6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     [46, 2079, 89890, 3894594]),
+]
+
+
+# ========== PERFT ==========
+
+def perft(state: BoardState, depth: int) -> int:
+    # Number of leaf positions exactly depth plies from here (the last ply is counted without making the moves)
+    if depth == 0:
+        return 1
+    moves = state.get_all_valid_moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        undo = state.make_move(move)
+        nodes += perft(state, depth - 1)
+        state.unmake_move(move, undo)
+    return nodes
+
+
+def divide(state: BoardState, depth: int) -> list:
+    # Perft split by root move, as (UCI move, nodes) pairs (compare against another engine to find a bad move)
+    results = []
+    for move in state.get_all_valid_moves():
+        undo = state.make_move(move)
+        results.append((move_to_uci(move), perft(state, depth - 1)))
+        state.unmake_move(move, undo)
+    return sorted(results)
+
+
+def timed_perft(state: BoardState, depth: int):
+    # Returns (nodes, seconds)
+    start = time.perf_counter()
+    nodes = perft(state, depth)
+    return nodes, time.perf_counter() - start
+
+
+def format_rate(nodes: int, seconds: float) -> str:
+    return f"{nodes / seconds:,.0f} nps" if seconds > 0 else "- nps"
+
+
+# ========== COMMAND LINE ==========
+
+def run_suite(max_depth: int) -> bool:
+    # Every reference position up to max_depth, returns False if any count is wrong
+    all_passed = True
+    total_nodes = 0
+    total_time = 0.0
+    for name, fen, counts in PERFT_POSITIONS:
+        state = BoardState.from_fen(fen)
+        for depth, expected in enumerate(counts[:max_depth], 1):
+            nodes, seconds = timed_perft(state, depth)
+            total_nodes += nodes
+            total_time += seconds
+            passed = nodes == expected
+            all_passed = all_passed and passed
+            print(f"{'ok  ' if passed else 'FAIL'} {name:<10} depth {depth}: {nodes:>10,} "
+                  f"(expected {expected:,}) {seconds:7.2f}s {format_rate(nodes, seconds)}")
+    print(f"total: {total_nodes:,} nodes in {total_time:.2f}s, {format_rate(total_nodes, total_time)}")
+    return all_passed
+
+
+def run_position(fen: str, depth: int, show_divide: bool):
+    state = BoardState.from_fen(fen)
+    start = time.perf_counter()
+    if show_divide:
+        results = divide(state, depth)
+        for uci, nodes in results:
+            print(f"{uci}: {nodes}")
+        nodes = sum(nodes for _, nodes in results)
+        print(f"moves: {len(results)}")
+    else:
+        nodes = perft(state, depth)
+    seconds = time.perf_counter() - start
+    print(f"nodes: {nodes:,} in {seconds:.2f}s, {format_rate(nodes, seconds)}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Perft node counts for the chess move generator")
+    parser.add_argument("--fen", help="position to count (default: run the reference suite)")
+    parser.add_argument("--depth", type=int, default=3, help="search depth (suite: deepest depth checked)")
+    parser.add_argument("--divide", action="store_true", help="break the count down by root move")
+    parser.add_argument("--suite", action="store_true", help="run the reference positions")
+    args = parser.parse_args(argv)
+
+    if args.fen is None or args.suite:
+        return 0 if run_suite(args.depth) else 1
+    run_position(args.fen, args.depth, args.divide)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
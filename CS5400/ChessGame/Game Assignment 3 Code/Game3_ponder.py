@@ -0,0 +1,61 @@
+# Pondering: while the opponent thinks, search the position after the reply we expect in a background thread.
+# If they play it, the next search starts from that context (transposition table, history and PV already filled);
+# if not, it is thrown away.
+import threading
+
+from games.chess.Game3_chess_tools import BoardState, SearchContext
+from games.chess.Game3_time_manager import SearchLimits
+
+
+class Ponderer:
+    def __init__(self, tt_size_mb: float = 16):
+        self.tt_size_mb = tt_size_mb
+        self.thread = None
+        self.clock = None
+        self.context = None
+        self.expected_hash = None
+        # Outcome of the last prediction ("hit", "miss" or None when nothing was pondered)
+        self.last_result = None
+
+    def start(self, state: BoardState, our_move, pv: list, context: SearchContext | None = None):
+        # Start pondering after our move, on the reply the search predicted (the second move of its PV).
+        # Passing the engine's own context lets a hit continue straight from everything it already knows.
+        self.stop()
+        if len(pv) < 2 or pv[0] != our_move:
+            return
+        ponder_state = state.copy()
+        ponder_state.make_move(our_move)
+        ponder_state.make_move(pv[1])
+        ponder_state.is_white_player = ponder_state.white_to_move
+
+        self.context = context if context is not None else SearchContext(self.tt_size_mb)
+        # No limits: keep deepening until stop()
+        self.clock = SearchLimits(self.context)
+        self.expected_hash = ponder_state.hash
+        self.thread = threading.Thread(target=ponder_state.get_best_move, args=(self.context, self.clock),
+                                       daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        # Ask the running search to finish (it checks every TIME_CHECK_INTERVAL nodes) and wait for it
+        if self.thread is None:
+            return
+        self.clock.stop()
+        self.thread.join()
+        self.thread = None
+
+    def take(self, state: BoardState) -> SearchContext | None:
+        # Stop pondering and hand over its context if the position is the one we pondered on
+        if self.context is None:
+            self.last_result = None
+            return None
+        self.stop()
+        context = self.context
+        self.context = None
+        if state.hash == self.expected_hash:
+            self.last_result = "hit"
+            return context
+        # The pondered PV is for a position that never happened
+        context.pv = []
+        self.last_result = "miss"
+        return None
@@ -0,0 +1,115 @@
+# Per-depth search statistics and optional profiling, for seeing where each turn's time goes.
+import cProfile
+import io
+import json
+import pstats
+import time
+
+
+class DepthStats:
+    # Counters for one iterative-deepening iteration
+    def __init__(self, depth: int, nodes: int, leaf_evals: int, cutoffs: int, first_move_cutoffs: int,
+                 seconds: float, score, best_move: str | None, completed: bool):
+        self.depth = depth
+        self.nodes = nodes
+        self.leaf_evals = leaf_evals
+        self.cutoffs = cutoffs
+        self.first_move_cutoffs = first_move_cutoffs
+        self.seconds = seconds
+        self.score = score
+        self.best_move = best_move
+        self.completed = completed
+        # Nodes compared to the previous iteration (filled in by SearchStats)
+        self.branching_factor = None
+
+    @property
+    def first_move_cutoff_rate(self) -> float:
+        # How often the first move searched was already good enough (a measure of move ordering)
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    @property
+    def nps(self) -> float:
+        return self.nodes / self.seconds if self.seconds > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "depth": self.depth,
+            "nodes": self.nodes,
+            "evals": self.leaf_evals,
+            "cutoffs": self.cutoffs,
+            "fmc": round(self.first_move_cutoff_rate, 3),
+            "ebf": None if self.branching_factor is None else round(self.branching_factor, 2),
+            "time": round(self.seconds, 4),
+            "nps": round(self.nps),
+            "score": self.score,
+            "move": self.best_move,
+            "completed": self.completed,
+        }
+
+
+class SearchStats:
+    # Collects a DepthStats for every iteration of one search, from the running counters on the SearchContext
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.depths = []
+        self._last_counters = (0, 0, 0, 0)
+        self._last_time = self.start
+
+    def record_depth(self, depth: int, context, score, best_move: str | None, completed: bool = True):
+        # Called at the end of every iteration (completed or aborted)
+        now = time.perf_counter()
+        counters = (context.nodes, context.leaf_evals, context.cutoffs, context.first_move_cutoffs)
+        nodes, leaf_evals, cutoffs, first_move_cutoffs = (
+            current - last for current, last in zip(counters, self._last_counters))
+        stats = DepthStats(depth, nodes, leaf_evals, cutoffs, first_move_cutoffs, now - self._last_time,
+                           score, best_move, completed)
+        if self.depths and self.depths[-1].nodes and completed:
+            stats.branching_factor = nodes / self.depths[-1].nodes
+        self.depths.append(stats)
+        self._last_counters = counters
+        self._last_time = now
+
+    @property
+    def completed_depth(self) -> int:
+        return max((stats.depth for stats in self.depths if stats.completed), default=0)
+
+    @property
+    def nodes(self) -> int:
+        return sum(stats.nodes for stats in self.depths)
+
+    @property
+    def elapsed(self) -> float:
+        return self._last_time - self.start
+
+    def summary(self) -> dict:
+        cutoffs = sum(stats.cutoffs for stats in self.depths)
+        first_move_cutoffs = sum(stats.first_move_cutoffs for stats in self.depths)
+        elapsed = self.elapsed
+        return {
+            "depth": self.completed_depth,
+            "nodes": self.nodes,
+            "evals": sum(stats.leaf_evals for stats in self.depths),
+            "fmc": round(first_move_cutoffs / cutoffs, 3) if cutoffs else 0.0,
+            "time": round(elapsed, 4),
+            "nps": round(self.nodes / elapsed) if elapsed > 0 else 0,
+            "iterations": [stats.as_dict() for stats in self.depths],
+        }
+
+    def log_line(self, **fields) -> str:
+        # One JSON line per move (extra fields such as the move and the clock go first)
+        return "search " + json.dumps({**fields, **self.summary()}, separators=(",", ":"))
+
+
+# ========== PROFILING ==========
+
+def run_profiled(function, *args, path: str | None = None, top: int = 25, **kwargs):
+    # Run function under cProfile, then save the raw stats to path (for snakeviz/pstats) or print the top entries
+    profiler = cProfile.Profile()
+    result = profiler.runcall(function, *args, **kwargs)
+    if path is not None:
+        profiler.dump_stats(path)
+    else:
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(top)
+        print(output.getvalue())
+    return result
@@ -0,0 +1,268 @@
+# Endgame tablebases for king + queen/rook/pawn against a lone king, generated by retrograde analysis.
+# Each table has one byte per position, indexed by (side to move, strong king, strong piece, weak king), with the
+# strong side always stored as white (black-strong positions are probed with the board flipped, which also turns a
+# black pawn into a white one):
+#   0        draw (or an illegal placement)
+#   1-127    the side to move mates in that many plies
+#   128+n    the side to move gets mated in n plies (128 = already checkmated)
+# Generate the files with:  python -m games.chess.Game3_tablebases [directory]
+# (4-piece tables index 64 times as many positions, far too many to generate in pure Python, so only these 3-piece
+# tables exist)
+import os
+import sys
+import time
+from array import array
+
+from games.chess.Game3_bitboards import KING_ATTACKS, PAWN_ATTACKS, iter_squares, queen_attacks, rook_attacks
+
+TABLEBASE_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+# Endgames with a table, by the strong side's extra piece
+TABLEBASE_PIECES = "QRP"
+# Positions with more pieces than this are never probed
+TABLEBASE_MAX_PIECES = 3
+
+TABLE_SIZE = 2 * 64 * 64 * 64
+STRONG_TO_MOVE = 0
+WEAK_TO_MOVE = 1
+LOSS_OFFSET = 128
+
+# Loaded tables by strong piece ("Q", "R", "P")
+loaded_tables = {}
+
+
+def table_index(side: int, strong_king: int, piece: int, weak_king: int) -> int:
+    return (((side << 6) | strong_king) << 12) | (piece << 6) | weak_king
+
+
+def table_path(piece: str, directory: str = TABLEBASE_DIRECTORY) -> str:
+    return os.path.join(directory, f"Game3_K{piece}K.tb")
+
+
+def _piece_attacks(piece: str, square: int, occupied: int) -> int:
+    return rook_attacks(square, occupied) if piece == "R" else queen_attacks(square, occupied)
+
+
+# ========== GENERATION ==========
+
+def generate_table(piece: str, tables: dict | None = None) -> bytes:
+    # tables: tables already generated, by piece (KPK needs the KQK and KRK tables it promotes into)
+    if piece == "P":
+        tables = tables or {}
+        return generate_pawn_table({promoted: tables[promoted] if promoted in tables else generate_table(promoted)
+                                    for promoted in "QR"})
+
+    # Retrograde analysis: start from every checkmate, then walk backwards one ply at a time.
+    # A strong-side position is a win as soon as one move reaches a lost position; a weak-side position
+    # is lost once every one of its moves reaches a won position (counted down in remaining_moves).
+    table = bytearray(TABLE_SIZE)
+    resolved = bytearray(TABLE_SIZE)
+    remaining_moves = array("b", bytes(TABLE_SIZE))
+    frontier = []
+
+    for strong_king in range(64):
+        for piece_square in range(64):
+            if piece_square == strong_king:
+                continue
+            for weak_king in range(64):
+                if weak_king in (strong_king, piece_square) or KING_ATTACKS[strong_king] >> weak_king & 1:
+                    continue
+                # The weak king's moves: never next to the strong king, never onto an attacked square (sliding
+                # attacks go through the square it leaves), and taking the piece only when it's undefended
+                occupied = (1 << strong_king) | (1 << piece_square)
+                attacked = _piece_attacks(piece, piece_square, occupied) | KING_ATTACKS[strong_king]
+                targets = KING_ATTACKS[weak_king] & ~attacked & ~(1 << strong_king)
+                remaining_moves[table_index(WEAK_TO_MOVE, strong_king, piece_square, weak_king)] = targets.bit_count()
+                if not targets and (attacked >> weak_king) & 1:
+                    # Checkmate
+                    index = table_index(WEAK_TO_MOVE, strong_king, piece_square, weak_king)
+                    table[index] = LOSS_OFFSET
+                    resolved[index] = 1
+                    frontier.append((strong_king, piece_square, weak_king))
+
+    plies = 0
+    while frontier:
+        plies += 1
+        next_frontier = []
+        if plies % 2:
+            # Strong side to move: un-move the king or the piece from every lost position
+            for strong_king, piece_square, weak_king in frontier:
+                occupied = (1 << strong_king) | (1 << piece_square) | (1 << weak_king)
+                candidates = [(start, piece_square) for start in iter_squares(
+                    KING_ATTACKS[strong_king] & ~occupied & ~KING_ATTACKS[weak_king])]
+                candidates += [(strong_king, start) for start in iter_squares(
+                    _piece_attacks(piece, piece_square, occupied) & ~occupied)]
+                for king_start, piece_start in candidates:
+                    index = table_index(STRONG_TO_MOVE, king_start, piece_start, weak_king)
+                    if resolved[index]:
+                        continue
+                    # The weak king can't be in check with the strong side to move
+                    start_occupied = (1 << king_start) | (1 << piece_start) | (1 << weak_king)
+                    if (_piece_attacks(piece, piece_start, start_occupied) >> weak_king) & 1:
+                        continue
+                    table[index] = plies
+                    resolved[index] = 1
+                    next_frontier.append((king_start, piece_start, weak_king))
+        else:
+            # Weak side to move: un-move the weak king from every won position
+            for strong_king, piece_square, weak_king in frontier:
+                occupied = (1 << strong_king) | (1 << piece_square) | (1 << weak_king)
+                for start in iter_squares(KING_ATTACKS[weak_king] & ~occupied & ~KING_ATTACKS[strong_king]):
+                    index = table_index(WEAK_TO_MOVE, strong_king, piece_square, start)
+                    if resolved[index]:
+                        continue
+                    remaining_moves[index] -= 1
+                    if remaining_moves[index] == 0:
+                        table[index] = LOSS_OFFSET + plies
+                        resolved[index] = 1
+                        next_frontier.append((strong_king, piece_square, start))
+        frontier = next_frontier
+    return bytes(table)
+
+
+def generate_pawn_table(promotion_tables: dict) -> bytes:
+    # KPK: the same analysis with the pawn as white's piece (on rows 1-6), except that wins start from promotions
+    # rather than checkmates. Promoting into a position the weak side loses in n plies (in whichever of the KQK
+    # and KRK tables is quicker) wins in n + 1, so that position joins the frontier at ply n + 1.
+    # Positions the strong side can't force a promotion from stay draws.
+    table = bytearray(TABLE_SIZE)
+    resolved = bytearray(TABLE_SIZE)
+    remaining_moves = array("b", bytes(TABLE_SIZE))
+    pawn_attacks = PAWN_ATTACKS[True]
+    frontier = []
+    # Strong-to-move positions won by promoting, by the ply they're won at
+    promotions = {}
+
+    for strong_king in range(64):
+        for pawn in range(8, 56):
+            if pawn == strong_king:
+                continue
+            for weak_king in range(64):
+                if weak_king in (strong_king, pawn) or KING_ATTACKS[strong_king] >> weak_king & 1:
+                    continue
+                # The weak king can take the pawn only when the strong king doesn't defend it
+                attacked = pawn_attacks[pawn] | KING_ATTACKS[strong_king]
+                targets = KING_ATTACKS[weak_king] & ~attacked & ~(1 << strong_king)
+                remaining_moves[table_index(WEAK_TO_MOVE, strong_king, pawn, weak_king)] = targets.bit_count()
+                if not targets and (attacked >> weak_king) & 1:
+                    index = table_index(WEAK_TO_MOVE, strong_king, pawn, weak_king)
+                    table[index] = LOSS_OFFSET
+                    resolved[index] = 1
+                    frontier.append((strong_king, pawn, weak_king))
+
+                # Strong side to move (so the weak king isn't in check) with the pawn free to promote
+                promotion = pawn - 8
+                if pawn >= 16 or (pawn_attacks[pawn] >> weak_king) & 1 or promotion in (strong_king, weak_king):
+                    continue
+                lost_in = [promoted_table[table_index(WEAK_TO_MOVE, strong_king, promotion, weak_king)] - LOSS_OFFSET
+                           for promoted_table in promotion_tables.values()]
+                lost_in = [plies for plies in lost_in if plies >= 0]
+                if lost_in:
+                    promotions.setdefault(min(lost_in) + 1, []).append((strong_king, pawn, weak_king))
+
+    plies = 0
+    last_promotion = max(promotions, default=0)
+    while frontier or plies < last_promotion:
+        plies += 1
+        next_frontier = []
+        if plies % 2:
+            # Strong side to move: un-move the king (unless the pawn is what gives check) or the pawn
+            for strong_king, pawn, weak_king in frontier:
+                occupied = (1 << strong_king) | (1 << pawn) | (1 << weak_king)
+                candidates = []
+                if not (pawn_attacks[pawn] >> weak_king) & 1:
+                    candidates = [(start, pawn) for start in iter_squares(
+                        KING_ATTACKS[strong_king] & ~occupied & ~KING_ATTACKS[weak_king])]
+                if pawn + 8 < 56 and not (occupied >> (pawn + 8)) & 1:
+                    candidates.append((strong_king, pawn + 8))
+                    # Double step from the second rank
+                    if 32 <= pawn < 40 and not (occupied >> (pawn + 16)) & 1:
+                        candidates.append((strong_king, pawn + 16))
+                for king_start, pawn_start in candidates:
+                    index = table_index(STRONG_TO_MOVE, king_start, pawn_start, weak_king)
+                    if resolved[index] or (pawn_attacks[pawn_start] >> weak_king) & 1:
+                        continue
+                    table[index] = plies
+                    resolved[index] = 1
+                    next_frontier.append((king_start, pawn_start, weak_king))
+            for position in promotions.get(plies, ()):
+                index = table_index(STRONG_TO_MOVE, *position)
+                if not resolved[index]:
+                    table[index] = plies
+                    resolved[index] = 1
+                    next_frontier.append(position)
+        else:
+            # Weak side to move: un-move the weak king from every won position
+            for strong_king, pawn, weak_king in frontier:
+                occupied = (1 << strong_king) | (1 << pawn) | (1 << weak_king)
+                for start in iter_squares(KING_ATTACKS[weak_king] & ~occupied & ~KING_ATTACKS[strong_king]):
+                    index = table_index(WEAK_TO_MOVE, strong_king, pawn, start)
+                    if resolved[index]:
+                        continue
+                    remaining_moves[index] -= 1
+                    if remaining_moves[index] == 0:
+                        table[index] = LOSS_OFFSET + plies
+                        resolved[index] = 1
+                        next_frontier.append((strong_king, pawn, start))
+        frontier = next_frontier
+    return bytes(table)
+
+
+def generate_tables(directory: str = TABLEBASE_DIRECTORY, pieces: str = TABLEBASE_PIECES):
+    tables = {}
+    for piece in pieces:
+        start = time.perf_counter()
+        table = generate_table(piece, tables)
+        tables[piece] = table
+        with open(table_path(piece, directory), "wb") as table_file:
+            table_file.write(table)
+        longest = max(value for value in table if value < LOSS_OFFSET)
+        print(f"K{piece}K: longest mate {longest} plies, {time.perf_counter() - start:.1f}s")
+
+
+# ========== PROBING ==========
+
+def load_tablebases(directory: str = TABLEBASE_DIRECTORY) -> int:
+    # Load every table file that exists, returns how many were loaded
+    for piece in TABLEBASE_PIECES:
+        path = table_path(piece, directory)
+        if piece not in loaded_tables and os.path.exists(path):
+            with open(path, "rb") as table_file:
+                table = table_file.read()
+            if len(table) == TABLE_SIZE:
+                loaded_tables[piece] = table
+    return len(loaded_tables)
+
+
+def probe_tablebase(state):
+    # For a position with a table: (the side to move wins, plies to mate) or (None, 0) for a draw.
+    # Returns None when there is no table for the position.
+    if state.castling_rights:
+        return None
+    bitboards = state.bitboards
+    for piece in loaded_tables:
+        if bitboards[piece]:
+            strong_is_white = True
+        elif bitboards[piece.lower()]:
+            strong_is_white = False
+        else:
+            continue
+        strong_king = bitboards["K" if strong_is_white else "k"].bit_length() - 1
+        weak_king = bitboards["k" if strong_is_white else "K"].bit_length() - 1
+        piece_square = bitboards[piece if strong_is_white else piece.lower()].bit_length() - 1
+        if not strong_is_white:
+            # Flip the board so the strong side is white (our square 0 is a8, so flipping is ^ 56)
+            strong_king ^= 56
+            weak_king ^= 56
+            piece_square ^= 56
+        side = STRONG_TO_MOVE if state.white_to_move == strong_is_white else WEAK_TO_MOVE
+        value = loaded_tables[piece][table_index(side, strong_king, piece_square, weak_king)]
+        if value == 0:
+            return None, 0
+        if value < LOSS_OFFSET:
+            return True, value
+        return False, value - LOSS_OFFSET
+    return None
+
+
+if __name__ == '__main__':
+    generate_tables(sys.argv[1] if len(sys.argv) > 1 else TABLEBASE_DIRECTORY)
@@ -0,0 +1,86 @@
+# Per-move time budgets for the iterative-deepening search, and other ways of limiting it (depth, nodes,
+# fixed time, or until told to stop).
+import math
+import time
+
+# Assume the game lasts at least this many moves, but always plan for at least this many more
+EXPECTED_GAME_LENGTH = 50
+MIN_MOVES_TO_GO = 15
+
+# Seconds held back every move for network and bookkeeping overhead
+MOVE_OVERHEAD = 0.25
+
+# The running iteration is aborted after this multiple of the normal budget
+HARD_LIMIT_FACTOR = 3.0
+# Never spend more than this fraction of the remaining time on one move
+MAX_FRACTION_OF_REMAINING = 0.25
+
+
+class TimeManager:
+    # Splits the remaining clock into a soft limit (don't start another depth after it)
+    # and a hard limit (abort the depth that is running)
+    max_nodes = None
+
+    def __init__(self, time_remaining: float, increment: float = 0.0, fullmove_number: int = 1):
+        # All times are in seconds
+        self.start = time.perf_counter()
+        usable = max(0.0, time_remaining - MOVE_OVERHEAD)
+        moves_to_go = max(MIN_MOVES_TO_GO, EXPECTED_GAME_LENGTH - fullmove_number)
+        budget = usable / moves_to_go + increment * 0.75
+        ceiling = usable * MAX_FRACTION_OF_REMAINING
+        self.soft_limit = min(budget, ceiling)
+        self.hard_limit = min(budget * HARD_LIMIT_FACTOR, ceiling)
+
+    @classmethod
+    def from_player(cls, player, fullmove_number: int, increment: float = 0.0) -> 'TimeManager':
+        # Joueur reports the player's remaining time in nanoseconds
+        return cls(player.time_remaining / 1e9, increment, fullmove_number)
+
+    @property
+    def deadline(self) -> float:
+        # perf_counter() time at which the running iteration has to stop
+        return self.start + self.hard_limit
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def should_start_iteration(self) -> bool:
+        return self.elapsed() < self.soft_limit
+
+
+class SearchLimits:
+    # Stands in for the TimeManager when the search is limited some other way: any mix of a fixed depth,
+    # a node count and a fixed time (seconds), optionally inside a TimeManager's budget. With no limits it
+    # keeps deepening until stop() is called (pondering, UCI "go infinite").
+    def __init__(self, context, depth: int | None = None, nodes: int | None = None, move_time: float | None = None,
+                 time_manager: TimeManager | None = None):
+        self.start = time.perf_counter()
+        self.context = context
+        self.depth = depth
+        self.max_nodes = nodes
+        self.move_time = move_time
+        self.time_manager = time_manager
+        self.stop_requested = False
+
+    @property
+    def deadline(self) -> float:
+        deadline = math.inf if self.move_time is None else self.start + self.move_time
+        if self.time_manager is not None:
+            deadline = min(deadline, self.time_manager.deadline)
+        return deadline
+
+    def should_start_iteration(self) -> bool:
+        if self.stop_requested:
+            return False
+        if self.depth is not None and self.context.stats.completed_depth >= self.depth:
+            return False
+        if self.max_nodes is not None and self.context.nodes >= self.max_nodes:
+            return False
+        if time.perf_counter() >= self.deadline:
+            return False
+        return self.time_manager is None or self.time_manager.should_start_iteration()
+
+    def stop(self):
+        # Abort the running search (it notices within TIME_CHECK_INTERVAL nodes)
+        self.stop_requested = True
+        self.context.stopped = True
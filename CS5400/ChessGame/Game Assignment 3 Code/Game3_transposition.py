@@ -0,0 +1,96 @@
+# Zobrist hashing and a fixed-size transposition table for the chess search.
+import random
+from array import array
+
+# ========== ZOBRIST KEYS ==========
+
+# Fixed seed so hashes are the same from run to run
+_zobrist_random = random.Random(0x5EED_C4E5)
+
+ZOBRIST_PIECES = {piece: [_zobrist_random.getrandbits(64) for _ in range(64)] for piece in "PNBRQKpnbrqk"}
+# Indexed by the castling rights bitmask (0-15)
+ZOBRIST_CASTLING = [_zobrist_random.getrandbits(64) for _ in range(16)]
+# Indexed by the file (column) of the en passant square
+ZOBRIST_EN_PASSANT = [_zobrist_random.getrandbits(64) for _ in range(8)]
+ZOBRIST_BLACK_TO_MOVE = _zobrist_random.getrandbits(64)
+
+
+def compute_hash(board: list, white_to_move: bool, castling_rights: int, en_passant_index: int | None) -> int:
+    # Full hash from scratch (BoardState updates it incrementally after this)
+    key = ZOBRIST_CASTLING[castling_rights]
+    for square, piece in enumerate(board):
+        if piece is not None:
+            key ^= ZOBRIST_PIECES[piece][square]
+    if en_passant_index is not None:
+        key ^= ZOBRIST_EN_PASSANT[en_passant_index % 8]
+    if not white_to_move:
+        key ^= ZOBRIST_BLACK_TO_MOVE
+    return key
+
+
+# ========== TRANSPOSITION TABLE ==========
+
+# Bound types
+BOUND_EXACT = 0
+BOUND_LOWER = 1  # Score is at least this (failed high)
+BOUND_UPPER = 2  # Score is at most this (failed low)
+# The same bound seen from the other player's side, indexed by bound
+FLIPPED_BOUNDS = (BOUND_EXACT, BOUND_UPPER, BOUND_LOWER)
+
+# key (8) + score (4) + depth (1) + bound (1) + move (2) + generation (1)
+ENTRY_BYTES = 17
+
+
+class TranspositionTable:
+    # Parallel arrays sized once from a memory budget. Each bucket has two slots:
+    # slot 0 keeps the deepest search seen (depth-preferred), slot 1 always takes the newest.
+    # The table lives across turns, so a deep entry from an earlier search stops protecting its slot.
+    def __init__(self, size_mb: float = 16):
+        # Round the entry count down to a power of two so indexing is a mask
+        entries = max(2, int(size_mb * 1024 * 1024) // ENTRY_BYTES)
+        entries = 1 << (entries.bit_length() - 1)
+        self.size_mb = size_mb
+        self.size = entries
+        self.mask = (entries >> 1) - 1
+        self.keys = array("Q", bytes(8 * entries))
+        self.scores = array("i", bytes(4 * entries))
+        self.depths = array("b", [-1]) * entries
+        self.bounds = array("B", bytes(entries))
+        self.moves = array("H", bytes(2 * entries))
+        self.generations = array("B", bytes(entries))
+        self.generation = 0
+
+    def clear(self):
+        self.__init__(self.size_mb)
+
+    def new_search(self):
+        self.generation = (self.generation + 1) & 0xFF
+
+    def probe(self, key: int):
+        # Returns (depth, score, bound, move) for a stored position, or None
+        index = (key & self.mask) << 1
+        if self.keys[index] == key and self.depths[index] >= 0:
+            return self.depths[index], self.scores[index], self.bounds[index], self.moves[index]
+        index += 1
+        if self.keys[index] == key and self.depths[index] >= 0:
+            return self.depths[index], self.scores[index], self.bounds[index], self.moves[index]
+        return None
+
+    def store(self, key: int, depth: int, score: int, bound: int, move: int):
+        index = (key & self.mask) << 1
+        # Replace the depth-preferred slot if it holds this position, a shallower search or an entry from an
+        # earlier search, otherwise fall back to the always-replace slot
+        if self.keys[index] != key and depth < self.depths[index] and self.generations[index] == self.generation:
+            index += 1
+        self.keys[index] = key
+        self.depths[index] = min(depth, 127)
+        self.scores[index] = score
+        self.bounds[index] = bound
+        self.moves[index] = move
+        self.generations[index] = self.generation
+
+    def hashfull(self) -> int:
+        # Permille of slots in use, as UCI reports it: positions hash uniformly, so the first 1000 slots are a
+        # fair sample (scanning the whole table would cost more than a short search)
+        sample = min(self.size, 1000)
+        return sum(1 for depth in self.depths[:sample] if depth >= 0) * 1000 // sample
@@ -0,0 +1,230 @@
+# UCI front-end, so the engine can be driven by standard chess tools (GUIs, cutechess-cli, fastchess) and
+# benchmarked with fixed depths, node counts or move times. Runs as a long-lived stdin/stdout process;
+# the search runs in a background thread so "stop" and "isready" are answered while it thinks.
+# Run from the Joueur.py directory:  python -m games.chess.Game3_uci
+import random
+import sys
+import threading
+
+from games.chess.Game3_chess_tools import (
+    MATE_SCORE, MATE_THRESHOLD, START_FEN, BoardState, SearchContext, move_to_uci, uci_to_move
+)
+from games.chess.Game3_bench import BENCH_DEPTH, run_bench
+from games.chess.Game3_engine import Engine, LocalGame
+from games.chess.Game3_tablebases import load_tablebases
+from games.chess.Game3_time_manager import SearchLimits, TimeManager
+
+ENGINE_NAME = "Game3"
+ENGINE_AUTHOR = "Simon Edmunds"
+
+# Transposition table size option (MB)
+DEFAULT_HASH_MB = 16
+MAX_HASH_MB = 1024
+
+# "go" arguments that take a number
+GO_NUMBER_ARGUMENTS = ("depth", "nodes", "movetime", "wtime", "btime", "winc", "binc", "movestogo")
+
+
+def format_score(score: int) -> str:
+    # UCI scores: centipawns, or mate in moves (negative when getting mated)
+    if score >= MATE_THRESHOLD:
+        return f"mate {(MATE_SCORE - score + 1) // 2}"
+    if score <= -MATE_THRESHOLD:
+        return f"mate {-((MATE_SCORE + score) // 2)}"
+    return f"cp {score}"
+
+
+def parse_go(tokens: list) -> dict:
+    # "go depth 6 nodes 100000 ..." -> {"depth": 6, "nodes": 100000, ...} (plus "infinite": True)
+    arguments = {}
+    for position, token in enumerate(tokens):
+        if token in GO_NUMBER_ARGUMENTS and position + 1 < len(tokens):
+            arguments[token] = int(tokens[position + 1])
+        elif token == "infinite":
+            arguments["infinite"] = True
+    return arguments
+
+
+class UciEngine:
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.output_lock = threading.Lock()
+        self.hash_mb = DEFAULT_HASH_MB
+        self.game = None
+        self.engine = None
+        self.new_game()
+        self.search_thread = None
+        self.limits = None
+        self.infinite = False
+        self.stop_event = threading.Event()
+
+    def send(self, line: str):
+        with self.output_lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    # ========== COMMANDS ==========
+
+    def handle(self, line: str) -> bool:
+        # Run one command, returns False on "quit"
+        tokens = line.split()
+        if not tokens:
+            return True
+        command = tokens[0]
+        if command == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send(f"option name Hash type spin default {DEFAULT_HASH_MB} min 1 max {MAX_HASH_MB}")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "ucinewgame":
+            self.wait()
+            self.new_game()
+        elif command == "setoption":
+            self.wait()
+            self.set_option(tokens[1:])
+        elif command == "position":
+            self.wait()
+            self.set_position(tokens[1:])
+        elif command == "go":
+            self.wait()
+            self.go(parse_go(tokens[1:]))
+        elif command == "stop":
+            self.stop()
+        elif command == "bench":
+            # "bench [depth]": the fixed benchmark (see Game3_bench), reported as info strings
+            self.wait()
+            depth = int(tokens[1]) if len(tokens) > 1 else BENCH_DEPTH
+            run_bench(depth, lambda line: self.send("info string " + line))
+        elif command == "quit":
+            self.stop()
+            return False
+        else:
+            self.send(f"info string unknown command {command}")
+        return True
+
+    def new_game(self):
+        # Fresh tables (also used to resize them), so a new game doesn't start from the last one's hash entries
+        self.game = LocalGame(START_FEN)
+        self.engine = Engine(self.game, self.hash_mb)
+        self.engine.context.iteration_callback = self.report_iteration
+
+    def set_option(self, tokens: list):
+        # "name <name> value <value>"
+        if "name" not in tokens or "value" not in tokens:
+            return
+        name = " ".join(tokens[tokens.index("name") + 1:tokens.index("value")]).lower()
+        value = " ".join(tokens[tokens.index("value") + 1:])
+        if name == "hash":
+            self.hash_mb = max(1, min(MAX_HASH_MB, int(value)))
+            self.new_game()
+        else:
+            self.send(f"info string unknown option {name}")
+
+    def set_position(self, tokens: list):
+        # "startpos [moves ...]" or "fen <6 fields> [moves ...]"
+        moves_at = tokens.index("moves") if "moves" in tokens else len(tokens)
+        if tokens and tokens[0] == "fen":
+            fen = " ".join(tokens[1:moves_at])
+        else:
+            fen = START_FEN
+        moves = tokens[moves_at + 1:]
+
+        # Check the moves on a scratch board first (the engine would quietly start over on an illegal one)
+        state = BoardState.from_fen(fen)
+        for count, uci in enumerate(moves):
+            move = uci_to_move(state, uci)
+            if move is None:
+                self.send(f"info string illegal move {uci}, ignoring the rest")
+                moves = moves[:count]
+                break
+            state.make_move(move)
+
+        # A position that continues the previous one only needs the new moves played (keeping the PV);
+        # anything else starts over from the FEN
+        if fen != self.game.fen or moves[:len(self.game.history)] != self.game.history:
+            self.game = LocalGame(fen)
+            self.engine.reset(self.game)
+        self.game.history = moves
+        self.engine.sync(self.game)
+
+    def go(self, arguments: dict):
+        state = self.engine.state
+        context = self.engine.context
+        time_manager = None
+        clock = arguments.get("wtime" if state.white_to_move else "btime")
+        if clock is not None:
+            increment = arguments.get("winc" if state.white_to_move else "binc", 0)
+            time_manager = TimeManager(clock / 1000, increment / 1000, state.fullmove_number)
+        move_time = arguments["movetime"] / 1000 if "movetime" in arguments else None
+        self.limits = SearchLimits(context, arguments.get("depth"), arguments.get("nodes"), move_time, time_manager)
+        self.infinite = arguments.get("infinite", False)
+        self.stop_event.clear()
+        # Ties between equal root moves are broken at random; seeding by position keeps fixed-depth and
+        # fixed-node searches repeatable
+        random.seed(state.hash)
+        self.search_thread = threading.Thread(target=self.search, daemon=True)
+        self.search_thread.start()
+
+    def stop(self):
+        # Abort a running search and wait for it to print its bestmove
+        if self.search_thread is None:
+            return
+        self.stop_event.set()
+        self.limits.stop()
+        self.search_thread.join()
+        self.search_thread = None
+
+    def wait(self):
+        # Let a running search finish before changing anything (so a piped script of commands runs every search
+        # to its limit); only an infinite search has to be stopped
+        if self.search_thread is None:
+            return
+        if self.infinite:
+            self.stop()
+            return
+        self.search_thread.join()
+        self.search_thread = None
+
+    # ========== SEARCH ==========
+
+    def search(self):
+        context = self.engine.context
+        move = self.engine.get_best_move(self.limits)
+        if move is None:
+            # Stopped before depth 1 finished (or no legal moves at all)
+            moves = self.engine.state.get_all_valid_moves()
+            move = moves[0] if moves else None
+        if self.infinite:
+            # UCI says an infinite search only answers after "stop"
+            self.stop_event.wait()
+        if move is None:
+            self.send("bestmove 0000")
+        elif len(context.pv) >= 2 and context.pv[0] == move:
+            self.send(f"bestmove {move_to_uci(move)} ponder {move_to_uci(context.pv[1])}")
+        else:
+            self.send(f"bestmove {move_to_uci(move)}")
+
+    def report_iteration(self, depth: int, score: int, context: SearchContext):
+        stats = context.stats
+        milliseconds = int(stats.elapsed * 1000)
+        nps = int(context.nodes * 1000 / milliseconds) if milliseconds else 0
+        pv = " ".join(move_to_uci(move) for move in context.pv)
+        self.send(f"info depth {depth} score {format_score(score)} nodes {context.nodes} nps {nps} "
+                  f"hashfull {context.tt.hashfull()} time {milliseconds} pv {pv}")
+
+
+def main() -> int:
+    load_tablebases()
+    uci = UciEngine()
+    for line in sys.stdin:
+        if not uci.handle(line):
+            return 0
+    # End of input (a piped script of commands): let the last search finish
+    uci.wait()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
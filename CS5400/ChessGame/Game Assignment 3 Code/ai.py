@@ -4,7 +4,17 @@ import random
 
 # <<-- Creer-Merge: imports -->> - Code you add between this comment and the end comment will be preserved between Creer re-runs.
 # you can add additional import(s) here
-from games.chess.Game3_chess_tools import BoardState, move_to_uci
+import json
+import os
+
+from games.chess.Game3_chess_tools import move_to_uci
+from games.chess.Game3_engine import Engine
+from games.chess.Game3_opening_book import load_default_book
+from games.chess.Game3_parallel import ParallelSearch
+from games.chess.Game3_ponder import Ponderer
+from games.chess.Game3_search_stats import run_profiled
+from games.chess.Game3_tablebases import load_tablebases
+from games.chess.Game3_time_manager import TimeManager
 from joueur.base_ai import BaseAI
 
 
@@ -39,14 +49,28 @@ class AI(BaseAI):
         """This is called once the game starts and your AI knows its player and game. You can initialize your AI here.
         """
         # <<-- Creer-Merge: start -->> - Code you add between this comment and the end comment will be preserved between Creer re-runs.
-        # replace with your start logic
+        # Endgame tables (generated offline with Game3_tablebases; missing files just aren't probed)
+        load_tablebases()
+        # Worker processes for the parallel root search (1 = search on this process only)
+        self.search_workers = os.cpu_count() or 1
+        self.parallel_search = ParallelSearch(self.search_workers) if self.search_workers > 1 else None
+        # Set to True to run every move's search under cProfile (saved as profile_move_<n>.prof)
+        self.profile_moves = False
+        # Keep searching on the opponent's time (set to None to turn pondering off)
+        self.ponderer = Ponderer()
+        # Opening book (set to None to always search)
+        self.opening_book = load_default_book()
+        # Board and search state kept for the whole game
+        self.engine = Engine(self.game, parallel=self.parallel_search)
         # <<-- /Creer-Merge: start -->>
 
     def game_updated(self) -> None:
         """This is called every time the game's state updates, so if you are tracking anything you can update it here.
         """
         # <<-- Creer-Merge: game-updated -->> - Code you add between this comment and the end comment will be preserved between Creer re-runs.
-        # replace with your game updated logic
+        # Once the opponent has moved, stop pondering so the thread is idle before make_move runs
+        if self.ponderer is not None and self.game.current_player == self.player:
+            self.ponderer.stop()
         # <<-- /Creer-Merge: game-updated -->>
 
     def end(self, won: bool, reason: str) -> None:
@@ -57,7 +81,12 @@ class AI(BaseAI):
             reason (str): The human readable string explaining why your AI won or lost.
         """
         # <<-- Creer-Merge: end -->> - Code you add between this comment and the end comment will be preserved between Creer re-runs.
-        # replace with your end logic
+        if self.ponderer is not None:
+            self.ponderer.stop()
+        if self.opening_book is not None:
+            self.opening_book.close()
+        if self.parallel_search is not None:
+            self.parallel_search.close()
         # <<-- /Creer-Merge: end -->>
 
     def make_move(self) -> str:
@@ -69,13 +98,41 @@ class AI(BaseAI):
         # <<-- Creer-Merge: makeMove -->> - Code you add between this comment and the end comment will be preserved between Creer re-runs.
         # Put your game logic here for makeMove
 
-        board_state = BoardState(self.game)
-        valid_moves = board_state.get_all_valid_moves()
-
-        print(len(valid_moves))
-        print(" ".join(sorted([move_to_uci(move) for move in valid_moves])))
-        best_move = move_to_uci(board_state.get_best_move())
-        print("My move =", best_move)
+        # Catch the engine's board up with the moves played since our last turn
+        if self.ponderer is not None:
+            self.ponderer.stop()
+        board_state = self.engine.sync(self.game)
+
+        # Play straight from the opening book while the position is in it
+        book_move = self.opening_book.choose_move(board_state) if self.opening_book is not None else None
+        if book_move is not None:
+            best_move = move_to_uci(book_move)
+            print("book " + json.dumps({"fullmove": board_state.fullmove_number, "move": best_move},
+                                       separators=(",", ":")))
+            return best_move
+
+        # Pondering shares the engine's context, so a correct prediction just carries on from that search
+        ponder = None
+        if self.ponderer is not None:
+            self.ponderer.take(board_state)
+            ponder = self.ponderer.last_result
+        context = self.engine.context
+        time_manager = TimeManager.from_player(self.player, board_state.fullmove_number)
+        if self.profile_moves:
+            move = run_profiled(self.engine.get_best_move, time_manager,
+                                path=f"profile_move_{board_state.fullmove_number}.prof")
+        else:
+            move = self.engine.get_best_move(time_manager)
+        best_move = move_to_uci(move)
+
+        # One structured line per move instead of printing the move list
+        print(context.stats.log_line(fullmove=board_state.fullmove_number, move=best_move,
+                                     clock=round(self.player.time_remaining / 1e9, 2),
+                                     budget=round(time_manager.soft_limit, 3), ponder=ponder,
+                                     hashfull=context.tt.hashfull()))
+
+        if self.ponderer is not None:
+            self.ponderer.start(board_state, move, context.pv, context)
         return best_move
         # <<-- /Creer-Merge: makeMove -->>
 
@@ -0,0 +1,34 @@
+# Move generator checks against the reference perft counts (Game3_perft has the deeper CLI suite).
+# Run from the Joueur.py directory:  python -m pytest games/chess/test_perft.py
+import pytest
+
+from games.chess.Game3_chess_tools import BoardState
+from games.chess.Game3_perft import PERFT_POSITIONS, perft
+from games.chess.Game3_transposition import compute_hash
+
+PERFT_TEST_DEPTH = 3
+
+
+@pytest.mark.parametrize("name, fen, counts", PERFT_POSITIONS, ids=[name for name, _, _ in PERFT_POSITIONS])
+def test_perft_counts(name, fen, counts):
+    state = BoardState.from_fen(fen)
+    for depth in range(1, PERFT_TEST_DEPTH + 1):
+        assert perft(state, depth) == counts[depth - 1], f"{name} depth {depth}"
+
+
+@pytest.mark.parametrize("name, fen, counts", PERFT_POSITIONS, ids=[name for name, _, _ in PERFT_POSITIONS])
+def test_make_unmake_keeps_hash(name, fen, counts):
+    # The incrementally updated hash matches one computed from scratch after every move two plies deep,
+    # and unmaking gets back the original board and hash
+    state = BoardState.from_fen(fen)
+    board = list(state.board)
+    key = state.hash
+    for move in state.get_all_valid_moves():
+        undo = state.make_move(move)
+        for reply in state.get_all_valid_moves():
+            reply_undo = state.make_move(reply)
+            assert state.hash == compute_hash(state.board, state.white_to_move, state.castling_rights,
+                                              state.en_passant_index)
+            state.unmake_move(reply, reply_undo)
+        state.unmake_move(move, undo)
+        assert state.board == board and state.hash == key
@@ -0,0 +1,35 @@
+# Static exchange evaluation checks on hand-worked exchanges.
+# Run from the Joueur.py directory:  python -m pytest games/chess/test_see.py
+import pytest
+
+from games.chess.Game3_chess_tools import BoardState, is_losing_capture, san_to_move, static_exchange
+
+EXCHANGES = [
+    # (FEN, move, material won by the side to move in centipawns)
+    ("1k1r4/1pp4p/p7/4p3/8/P5P1/1PP4P/2K1R3 w - - 0 1", "Rxe5", 100),  # Undefended pawn
+    ("1k1r3q/1ppn3p/p4b2/4p3/8/P2N2P1/1PP1R1BP/2K1Q3 w - - 0 1", "Nxe5", -200),  # Knight for a pawn
+    ("rnbqkbnr/ppp1pppp/8/3p4/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2", "exd5", 0),  # Pawn trade
+    ("4k3/8/2p5/3p4/8/8/8/3QK3 w - - 0 1", "Qxd5", -800),
+    ("4k3/8/2p5/3p4/8/8/3R4/3QK3 w - - 0 1", "Rxd5", -300),  # The queen x-rays through the rook
+    ("3rk3/3r4/8/3p4/8/8/3R4/3RK3 w - - 0 1", "Rxd5", -400),  # Black's doubled rooks win the exchange
+    ("4k3/8/8/3r4/8/8/3R4/3QK3 w - - 0 1", "Rxd5", 500),
+    ("4k3/1P6/8/8/8/8/8/4K3 w - - 0 1", "b8=Q", 800),
+    ("1r2k3/P7/8/8/8/8/8/4K3 w - - 0 1", "axb8=Q+", 1300),
+    ("rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3", "exf6", 0),  # En passant, retaken
+]
+
+
+@pytest.mark.parametrize("fen, san, expected", EXCHANGES)
+def test_static_exchange(fen, san, expected):
+    state = BoardState.from_fen(fen)
+    move = san_to_move(state, san)
+    assert static_exchange(state, move) == expected
+    assert is_losing_capture(state, move) == (expected < 0)
+
+
+def test_losing_capture_threshold():
+    # Losing 200 is below a -100 threshold but not below -300
+    state = BoardState.from_fen("1k1r3q/1ppn3p/p4b2/4p3/8/P2N2P1/1PP1R1BP/2K1Q3 w - - 0 1")
+    move = san_to_move(state, "Nxe5")
+    assert is_losing_capture(state, move, -100)
+    assert not is_losing_capture(state, move, -300)
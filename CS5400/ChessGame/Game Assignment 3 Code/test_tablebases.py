@@ -0,0 +1,104 @@
+# Tablebase checks: known KQK/KRK/KPK results, and every stored value agreeing with a one-ply lookahead.
+# Generates all three tables first (about 15s).
+# Run from the Joueur.py directory:  python -m pytest games/chess/test_tablebases.py
+import random
+
+import pytest
+
+from games.chess.Game3_chess_tools import BoardState
+from games.chess.Game3_tablebases import LOSS_OFFSET, TABLEBASE_PIECES, generate_table, loaded_tables, probe_tablebase
+
+# Longest mates (in plies) from the known tables
+LONGEST_MATES = {"Q": 19, "R": 31, "P": 55}
+
+KNOWN_RESULTS = [
+    # (FEN, (side to move wins, plies) or (None, 0) for a draw)
+    ("7k/5Q2/6K1/8/8/8/8/8 w - - 0 1", (True, 1)),
+    ("7k/6Q1/6K1/8/8/8/8/8 b - - 0 1", (False, 0)),
+    ("k7/8/1K6/8/8/8/8/7R w - - 0 1", (True, 1)),
+    ("8/8/8/8/8/8/6kR/K7 b - - 0 1", (None, 0)),  # The rook hangs
+    ("4k3/8/4K3/4P3/8/8/8/8 b - - 0 1", (False, None)),
+    ("7k/8/7K/7P/8/8/8/8 w - - 0 1", (None, 0)),  # Rook pawn
+    ("8/8/8/8/8/4k3/4P3/4K3 w - - 0 1", (None, 0)),
+    ("8/8/8/8/8/8/4p3/4k1K1 b - - 0 1", (True, None)),  # Black pawn (probed flipped)
+]
+
+
+@pytest.fixture(scope="module")
+def tables():
+    generated = {}
+    for piece in TABLEBASE_PIECES:
+        generated[piece] = generate_table(piece, generated)
+    saved = dict(loaded_tables)
+    loaded_tables.clear()
+    loaded_tables.update(generated)
+    yield generated
+    loaded_tables.clear()
+    loaded_tables.update(saved)
+
+
+@pytest.mark.parametrize("piece", TABLEBASE_PIECES)
+def test_longest_mate(tables, piece):
+    assert max(value for value in tables[piece] if value < LOSS_OFFSET) == LONGEST_MATES[piece]
+
+
+@pytest.mark.parametrize("fen, expected", KNOWN_RESULTS)
+def test_known_results(tables, fen, expected):
+    wins, plies = probe_tablebase(BoardState.from_fen(fen))
+    assert wins == expected[0]
+    if expected[1] is not None:
+        assert plies == expected[1]
+
+
+def _result(state: BoardState):
+    # The table result, with anything the tables don't cover (a bare king or minor piece left) as a draw
+    result = probe_tablebase(state)
+    return result if result is not None else (None, 0)
+
+
+def _random_position(rng: random.Random, piece: str) -> BoardState | None:
+    strong_king, piece_square, weak_king = rng.sample(range(64), 3)
+    if piece == "P" and not 8 <= piece_square < 56:
+        return None
+    if abs(strong_king // 8 - weak_king // 8) <= 1 and abs(strong_king % 8 - weak_king % 8) <= 1:
+        return None
+    board = [None] * 64
+    board[strong_king], board[piece_square], board[weak_king] = "K", piece, "k"
+    rows = []
+    for row in range(8):
+        text = "".join(square or "1" for square in board[row * 8:row * 8 + 8])
+        for empty in range(8, 0, -1):
+            text = text.replace("1" * empty, str(empty))
+        rows.append(text)
+    to_move, just_moved = rng.choice([("w", "b"), ("b", "w")])
+    # The side that just moved can't be left in check
+    if BoardState.from_fen(f"{'/'.join(rows)} {just_moved} - - 0 1").is_in_check():
+        return None
+    return BoardState.from_fen(f"{'/'.join(rows)} {to_move} - - 0 1")
+
+
+@pytest.mark.parametrize("piece", TABLEBASE_PIECES)
+def test_values_match_lookahead(tables, piece):
+    # Win in n: some move reaches a loss in n - 1. Loss in n: every move reaches a win, the longest in n - 1.
+    # Draw: neither.
+    rng = random.Random(piece)
+    checked = 0
+    while checked < 300:
+        state = _random_position(rng, piece)
+        if state is None:
+            continue
+        checked += 1
+        children = []
+        for move in state.get_all_valid_moves():
+            undo = state.make_move(move)
+            children.append(_result(state))
+            state.unmake_move(move, undo)
+        if not children:
+            expected = (False, 0) if state.is_in_check() else (None, 0)
+        elif any(wins is False for wins, _ in children):
+            expected = (True, min(plies for wins, plies in children if wins is False) + 1)
+        elif all(wins is True for wins, _ in children):
+            expected = (False, max(plies for _, plies in children) + 1)
+        else:
+            expected = (None, 0)
+        assert _result(state) == expected
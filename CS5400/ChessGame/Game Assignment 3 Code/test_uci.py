@@ -0,0 +1,47 @@
+# UCI front-end checks, driving UciEngine with command lines and reading what it prints.
+# Run from the Joueur.py directory:  python -m pytest games/chess/test_uci.py
+import io
+
+from games.chess.Game3_uci import UciEngine
+
+# White is a queen up: searching white and then black in one process must not read white's scores for black
+SIDE_SWITCH_FEN = "4k3/8/8/8/8/8/3QPPP1/4K3 w - - 0 1"
+
+
+def run_commands(commands: list) -> list:
+    # Feed commands to a fresh UciEngine, letting every search finish, and return the lines it printed
+    output = io.StringIO()
+    uci = UciEngine(output)
+    for command in commands:
+        uci.handle(command)
+    uci.wait()
+    return output.getvalue().splitlines()
+
+
+def last_search_scores(lines: list) -> dict:
+    # {depth: centipawns} from the info lines after the second-to-last bestmove
+    bestmoves = [index for index, line in enumerate(lines) if line.startswith("bestmove")]
+    scores = {}
+    for line in lines[bestmoves[-2] + 1 if len(bestmoves) > 1 else 0:]:
+        tokens = line.split()
+        if tokens[:2] == ["info", "depth"] and tokens[tokens.index("score") + 1] == "cp":
+            scores[int(tokens[2])] = int(tokens[tokens.index("score") + 2])
+    return scores
+
+
+def test_side_switch_keeps_score_signs():
+    black_position = f"position fen {SIDE_SWITCH_FEN} moves e2e4"
+    reused = last_search_scores(run_commands([f"position fen {SIDE_SWITCH_FEN}", "go depth 5", black_position,
+                                              "go depth 5"]))
+    fresh = last_search_scores(run_commands([black_position, "go depth 5"]))
+    assert sorted(reused) == sorted(fresh) == [1, 2, 3, 4, 5]
+    for depth in fresh:
+        # Black is a queen down at every depth (exact values can differ a little with the reused table)
+        assert fresh[depth] < -900
+        assert reused[depth] < -900, f"depth {depth}: {reused[depth]} in the same process, {fresh[depth]} fresh"
+
+
+def test_go_depth_reports_every_iteration():
+    lines = run_commands(["position startpos moves e2e4", "go depth 3"])
+    assert [line.split()[2] for line in lines if line.startswith("info depth")] == ["1", "2", "3"]
+    assert lines[-1].startswith("bestmove ")